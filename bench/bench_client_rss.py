@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Peak RSS of the part3 client as the corpus grows via repeat_words.
+
+Starts part3/server.py on 127.0.0.1 in a scratch directory for each repeat
+factor, runs part3/client.py against it (windowed and --stream) and reports
+the client's max RSS from wait4(). Counting is streamed into a Counter, so
+the numbers should stay flat from 1x to 1000x. Usage:
+
+    python3 bench/bench_client_rss.py [--repeats 1 10 100 1000] [--k 1000]
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PART3 = os.path.join(ROOT, "part3")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_config(workdir, port, repeat, k):
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        f.write("{\n"
+                f'  "server_ip": "127.0.0.1",\n  "port": {port},\n'
+                f'  "p": 0,\n  "k": {k},\n  "proc_ms": 0,\n  "repeat_words": {repeat}\n'
+                "}\n")
+
+
+def wait_ready(port, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not come up")
+
+
+def client_maxrss_kb(workdir, args):
+    proc = subprocess.Popen([sys.executable, os.path.join(PART3, "client.py")] + args,
+                            cwd=workdir, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"client exited with {proc.returncode}")
+    return usage.ru_maxrss
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeats", type=int, nargs="+", default=[1, 10, 100, 1000])
+    ap.add_argument("--k", type=int, default=1000, help="Words per request in windowed mode")
+    ap.add_argument("--window", type=int, default=8)
+    args = ap.parse_args()
+
+    print(f"{'repeat':>8} {'words':>10} {'window_rss_kb':>14} {'stream_rss_kb':>14}")
+    for repeat in args.repeats:
+        workdir = tempfile.mkdtemp(prefix="bench_rss_")
+        server = None
+        try:
+            shutil.copy(os.path.join(PART3, "words.txt"), workdir)
+            port = free_port()
+            write_config(workdir, port, repeat, args.k)
+            server = subprocess.Popen([sys.executable, os.path.join(PART3, "server.py")],
+                                      cwd=workdir, stdout=subprocess.DEVNULL)
+            wait_ready(port)
+
+            with open(os.path.join(workdir, "words.txt")) as f:
+                n_words = len(f.read().strip().split(",")) * repeat
+            window = client_maxrss_kb(workdir, ["--batch-size", str(args.window)])
+            stream = client_maxrss_kb(workdir, ["--stream"])
+            print(f"{repeat:>8} {n_words:>10} {window:>14} {stream:>14}")
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
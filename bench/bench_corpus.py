@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Per-request build cost: list slice + join + encode vs. Corpus memoryview.
+
+Builds a large corpus by repeating part3/words.txt and times how long it
+takes to produce the reply buffers for one "p,k" request at growing k.
+Usage:
+
+    python3 bench/bench_corpus.py [--repeat 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from common.corpus import Corpus
+
+K_VALUES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def per_call(fn, iters):
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) / iters
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=2000, help="Copies of words.txt in the corpus")
+    ap.add_argument("--iters", type=int, default=200)
+    args = ap.parse_args()
+
+    with open(os.path.join(ROOT, "part3", "words.txt")) as f:
+        text = ",".join([f.read().strip()] * args.repeat)
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as tmp:
+        tmp.write(text)
+    try:
+        corpus = Corpus(tmp.name)
+    finally:
+        os.unlink(tmp.name)
+    words = text.split(",")
+    print(f"corpus: {len(words)} words, {len(text)} bytes")
+
+    p = 1
+    print(f"{'k':>8} {'join_us':>10} {'corpus_us':>10}")
+    for k in K_VALUES:
+        join = per_call(lambda: (",".join(words[p:p + k]) + "\n").encode(), args.iters)
+        view = per_call(lambda: corpus.response(p, k), args.iters)
+        print(f"{k:>8} {join * 1e6:>10.2f} {view * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
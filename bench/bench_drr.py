@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Dispatch cost of the part4 round-robin schedulers vs. number of active clients.
+
+Compares the DRR active ring in part4/scheduler.py with the original
+list-rebuild-and-scan loop from process_requests, and times DRR with
+requests far larger than the quantum (k=65536 against the default quantum
+of 5, as --auto-k clients send). Usage:
+
+    python3 bench/bench_drr.py [--per-client 20]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "part4"))
+from scheduler import DRRScheduler
+
+CLIENT_COUNTS = [10, 100, 1000, 10000]
+LARGE_COST = 65536
+
+
+def bench_drr(n_clients, per_client, cost=5):
+    sched = DRRScheduler(quantum=5)
+    for r in range(per_client):
+        for c in range(n_clients):
+            sched.enqueue(c, r, cost)
+    total = n_clients * per_client
+    t0 = time.perf_counter()
+    for _ in range(total):
+        sched.pop()
+    return (time.perf_counter() - t0) / total
+
+
+def bench_linear(n_clients, per_client):
+    # Same pick logic as the pre-DRR process_requests loop.
+    client_queues = defaultdict(deque)
+    active_clients = set()
+    for r in range(per_client):
+        for c in range(n_clients):
+            client_queues[c].append(r)
+            active_clients.add(c)
+    total = n_clients * per_client
+    idx = 0
+    client_list = []
+    t0 = time.perf_counter()
+    for _ in range(total):
+        if set(client_list) != active_clients:
+            client_list = list(active_clients)
+        attempts = 0
+        while attempts < len(client_list):
+            idx %= len(client_list)
+            cid = client_list[idx]
+            if client_queues[cid]:
+                client_queues[cid].popleft()
+                if not client_queues[cid]:
+                    active_clients.remove(cid)
+                idx = (idx + 1) % len(client_list)
+                break
+            idx = (idx + 1) % len(client_list)
+            attempts += 1
+    return (time.perf_counter() - t0) / total
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--per-client", type=int, default=20, help="Queued requests per client")
+    ap.add_argument("--skip-linear", action="store_true", help="Only time the DRR scheduler")
+    args = ap.parse_args()
+
+    print(f"{'clients':>8} {'drr_ns':>10} {'drr_k64k_ns':>12} {'linear_ns':>12}")
+    for n in CLIENT_COUNTS:
+        drr = bench_drr(n, args.per_client) * 1e9
+        large = bench_drr(n, args.per_client, LARGE_COST) * 1e9
+        lin = "-" if args.skip_linear else f"{bench_linear(n, args.per_client) * 1e9:.0f}"
+        print(f"{n:>8} {drr:>10.0f} {large:>12.0f} {lin:>12}")
+
+
+if __name__ == "__main__":
+    main()
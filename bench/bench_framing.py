@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Cost of splitting a pipelined burst of c messages out of a socket.
+
+Both directions of a part3-style pipeline over a socketpair:
+
+  requests: c "p,k" lines read by the server receiver (FrameReader.lines)
+  replies:  c k-word reply lines read by a client (FrameReader.readlines,
+            and readline() for comparison)
+
+Each is parsed (best of --iters) with the original str concatenation + split("\\n", 1) loop,
+with a file object from sock.makefile, and with
+common.framing.FrameReader. Usage:
+
+    python3 bench/bench_framing.py [--k 5] [--iters 20]
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.framing import FrameReader
+
+C_VALUES = [1, 10, 100, 1000]
+
+
+def parse_str(sock, c):
+    # The pre-framing receiver: decode every chunk, then peel lines one by one.
+    buf, got = "", 0
+    while got < c:
+        buf += sock.recv(4096).decode()
+        while "\n" in buf:
+            line, buf = buf.split("\n", 1)
+            got += 1
+    return got
+
+
+def parse_makefile(sock, c):
+    rfile = sock.makefile("rb")
+    for _ in range(c):
+        rfile.readline()
+    return c
+
+
+def parse_framing(sock, c):
+    # Server receiver: one fill() per readable event, then every line at once.
+    reader, got = FrameReader(sock), 0
+    while got < c:
+        reader.fill()
+        got += len(reader.lines())
+    return got
+
+
+def parse_framing_readline(sock, c):
+    # One blocking readline() per reply.
+    reader = FrameReader(sock)
+    for _ in range(c):
+        reader.readline()
+    return c
+
+
+def parse_framing_readlines(sock, c):
+    # part3 client: every reply that has arrived, split once per fill().
+    reader, got = FrameReader(sock), 0
+    while got < c:
+        got += len(reader.readlines())
+    return got
+
+
+def timed(parse, payload, c, iters):
+    best = float("inf")
+    for _ in range(iters):
+        a, b = socket.socketpair()
+        sender = threading.Thread(target=a.sendall, args=(payload,))
+        t0 = time.perf_counter()
+        sender.start()
+        assert parse(b, c) == c
+        best = min(best, time.perf_counter() - t0)
+        sender.join()
+        a.close()
+        b.close()
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--k", type=int, default=5, help="Words per reply")
+    ap.add_argument("--iters", type=int, default=20)
+    args = ap.parse_args()
+
+    reply = (",".join(["word"] * args.k) + "\n").encode()
+    print(f"{'dir':>8} {'c':>6} {'str_us':>10} {'makefile_us':>12} {'framing_us':>11} {'readline_us':>12}")
+    for c in C_VALUES:
+        requests = b"".join(f"{i * args.k},{args.k}\n".encode() for i in range(c))
+        row = [timed(f, requests, c, args.iters) for f in (parse_str, parse_makefile, parse_framing)]
+        print(f"{'requests':>8} {c:>6} {row[0] * 1e6:>10.1f} {row[1] * 1e6:>12.1f} {row[2] * 1e6:>11.1f}")
+    for c in C_VALUES:
+        replies = reply * c
+        row = [timed(f, replies, c, args.iters)
+               for f in (parse_str, parse_makefile, parse_framing_readlines, parse_framing_readline)]
+        print(f"{'replies':>8} {c:>6} {row[0] * 1e6:>10.1f} {row[1] * 1e6:>12.1f} {row[2] * 1e6:>11.1f} "
+              f"{row[3] * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Adaptive chunk size (k) for the download clients.
+
+Small k makes a download round-trip bound; very large k makes every reply
+slow and, on a shared server, unfair. Instead of sweeping k by hand the
+clients can let a KTuner pick it while they run, in the style of TCP
+congestion control:
+
+  slow start:  k doubles after every epoch whose throughput beat the
+               previous one by more than `gain`; the first epoch that does
+               not improve undoes the last doubling and ends slow start.
+  avoidance:   k then grows by 1/8 per epoch (additive increase) while
+               throughput keeps improving, and settles once it does not;
+               a step that makes things worse is undone.
+  back-off:    a reply whose latency per word exceeds `spike` times the
+               smoothed value halves k (multiplicative decrease) and
+               resumes additive increase from there.
+
+An epoch is `samples` replies; throughput is words over wall-clock time, so
+it also works when several requests are in flight. `history` keeps one
+(seconds since start, k, words/s) entry per change for the logs.
+"""
+import time
+
+DEFAULT_K_MAX = 1 << 16
+
+
+class KTuner:
+    def __init__(self, k=1, k_min=1, k_max=DEFAULT_K_MAX, samples=4,
+                 gain=0.05, spike=4.0, alpha=0.125):
+        self.k_min = max(1, k_min)
+        self.k_max = max(self.k_min, k_max)
+        self.k = min(max(k, self.k_min), self.k_max)
+        self.samples = max(1, samples)
+        self.gain = gain
+        self.spike = spike
+        self.alpha = alpha
+
+        self.slow_start = True
+        self.settled = False
+        self.prev_k = self.k
+        self.last_tput = None
+        self.per_word = None        # smoothed latency per word (s)
+        self.t0 = time.monotonic()
+        self.history = [(0.0, self.k, 0.0)]
+        self._reset_epoch()
+
+    def _reset_epoch(self):
+        self.epoch_start = time.monotonic()
+        self.epoch_words = 0
+        self.epoch_replies = 0
+
+    def _set(self, k, tput):
+        k = min(max(int(k), self.k_min), self.k_max)
+        if k != self.k:
+            self.prev_k, self.k = self.k, k
+            self.history.append((time.monotonic() - self.t0, k, tput))
+
+    def observe(self, words, latency):
+        """Account one reply of `words` words that took `latency` seconds;
+        returns the k to use for the next request."""
+        if words > 0 and latency > 0:
+            per_word = latency / words
+            if self.per_word is not None and per_word > self.spike * self.per_word:
+                self.slow_start = self.settled = False
+                self.per_word = None
+                self.last_tput = None
+                self._set(self.k // 2, 0.0)
+                self._reset_epoch()
+                return self.k
+            if self.per_word is None:
+                self.per_word = per_word
+            else:
+                self.per_word += self.alpha * (per_word - self.per_word)
+
+        self.epoch_words += words
+        self.epoch_replies += 1
+        if self.epoch_replies >= self.samples:
+            elapsed = time.monotonic() - self.epoch_start
+            self._adjust(self.epoch_words / elapsed if elapsed > 0 else 0.0)
+            self._reset_epoch()
+        return self.k
+
+    def _adjust(self, tput):
+        last, self.last_tput = self.last_tput, tput
+        if self.settled:
+            return
+        if last is None:
+            grown = self.k * 2 if self.slow_start else self.k + max(1, self.k // 8)
+            self._set(grown, tput)
+            return
+        if self.slow_start:
+            if tput > last * (1 + self.gain):
+                self._set(self.k * 2, tput)
+            else:
+                self.slow_start = False
+                self._set(self.prev_k, tput)
+        elif tput > last * (1 + self.gain):
+            self._set(self.k + max(1, self.k // 8), tput)
+        else:
+            self.settled = True
+            if tput < last * (1 - self.gain):
+                self._set(self.prev_k, tput)
+
+    def trajectory(self):
+        """The k values chosen so far, e.g. "1,2,4,8,6"."""
+        return ",".join(str(k) for _, k, _ in self.history)
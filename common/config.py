@@ -0,0 +1,128 @@
+"""Configuration for every server, client, runner and tool.
+
+Values come from, lowest priority first:
+
+  1. the part's config.json (or --config PATH)
+  2. WC_<KEY> environment variables, e.g. WC_K=7 WC_PROTOCOL=binary
+  3. --set KEY=VALUE on the command line, repeatable
+
+and are converted to the type SCHEMA gives the key, so a typo or a bad
+value stops the process at startup instead of halfway through a sweep.
+WC_* variables that are not config keys are ignored with a warning, since
+the environment is shared with everything else on the machine.
+Runners hand per-run values to each server and client launch with
+set_args() rather than rewriting config.json, so the file is only ever
+read. Sweeps still share logs/ and the result files, so run one at a time
+per part directory.
+
+Servers and clients read their config at import time, before their own
+argparse runs, so from_argv() picks --config/--set out of sys.argv itself;
+add_arguments() puts the same options on the script's parser so they show
+in --help and are not rejected as unknown.
+"""
+import argparse
+import json
+import os
+import shlex
+import sys
+
+DEFAULT_FILE = "config.json"
+ENV_PREFIX = "WC_"
+
+# key -> type, or a tuple of the allowed strings
+SCHEMA = {
+    "server_ip": str,
+    "server_port": int,         # part1/part2
+    "port": int,                # part3/part4
+    "filename": str,
+    "k": int,
+    "p": int,
+    "c": int,
+    "num_clients": int,
+    "num_iterations": int,
+    "num_repetitions": int,
+    "protocol": ("text", "binary"),
+    "mode": ("serial", "pool"),
+    "workers": int,
+    "backlog": int,
+    "proc_ms": int,
+    "repeat_words": int,
+    "drr_quantum": int,
+    "latency_file": str,
+    "trace_file": str,          # part3/part4: record requests (common/trace.py)
+}
+
+
+def coerce(key, value, source="config"):
+    """value converted to SCHEMA[key]; ValueError for unknown keys or bad values."""
+    kind = SCHEMA.get(key)
+    if kind is None:
+        raise ValueError(f"{source}: unknown key {key!r}")
+    if isinstance(kind, tuple):
+        if value not in kind:
+            raise ValueError(f"{source}: {key} must be one of {', '.join(kind)}, not {value!r}")
+        return value
+    if kind is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{source}: {key} must be an integer, not {value!r}")
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{source}: {key} must be {kind.__name__}, not {value!r}") from None
+
+
+def parse_sets(pairs):
+    """["k=5", ...] -> {"k": 5, ...}"""
+    out = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise ValueError(f"--set {pair!r}: expected KEY=VALUE")
+        out[key] = coerce(key, value, "--set")
+    return out
+
+
+def load(path=DEFAULT_FILE, sets=(), environ=None):
+    """config.json at path, then WC_* variables, then sets (KEY=VALUE strings
+    or a dict), all typed by SCHEMA."""
+    with open(path) as f:
+        raw = json.load(f)
+    cfg = {key: coerce(key, value, str(path)) for key, value in raw.items()}
+    environ = os.environ if environ is None else environ
+    for name, value in environ.items():
+        if name.startswith(ENV_PREFIX):
+            key = name[len(ENV_PREFIX):].lower()
+            if key not in SCHEMA:
+                print(f"config: ignoring {name}, {key!r} is not a config key", file=sys.stderr)
+                continue
+            cfg[key] = coerce(key, value, name)
+    if isinstance(sets, dict):
+        cfg.update((key, coerce(key, value, "--set")) for key, value in sets.items())
+    else:
+        cfg.update(parse_sets(sets))
+    return cfg
+
+
+def add_arguments(ap):
+    ap.add_argument("--config", default=DEFAULT_FILE, help="Config file (default: %(default)s)")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                    help="Override a config value for this process (repeatable)")
+
+
+def from_argv(argv=None):
+    """load() with --config/--set taken from argv (default sys.argv)."""
+    ap = argparse.ArgumentParser(add_help=False)
+    add_arguments(ap)
+    args, _ = ap.parse_known_args(sys.argv[1:] if argv is None else argv)
+    try:
+        return load(args.config, args.set)
+    except ValueError as e:
+        sys.exit(f"config error: {e}")
+
+
+def set_args(values=None, path=None):
+    """Command-line options that make a launched script see `values` (and
+    read `path` instead of config.json), as a string for shell commands."""
+    argv = ["--config", str(path)] if path and str(path) != DEFAULT_FILE else []
+    for key, value in (values or {}).items():
+        argv += ["--set", f"{key}={value}"]
+    return shlex.join(argv)
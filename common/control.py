@@ -0,0 +1,63 @@
+"""Runner-side control of a live server.
+
+Sweeps keep one server up for every run instead of restarting it, and
+reset() is both the readiness probe and the between-runs RESET: it retries
+the connection until the server accepts it, sends RESET and waits for the
+"OK". A reply means the listener is up and a worker has served a request,
+which a fixed sleep after starting the server could only guess at. ping()
+only checks that the server is up, and stats() reads its live counters;
+neither waits behind queued client requests.
+"""
+import json
+import socket
+import time
+
+from . import protocol
+from .framing import FrameReader
+
+READY_TIMEOUT = 30.0
+RETRY_S = 0.02
+
+
+def command(host, port, cmd, timeout=READY_TIMEOUT, source=None):
+    """Send one text command once the server accepts connections; returns
+    (reply line, seconds spent waiting). Raises TimeoutError if it never
+    answers."""
+    t0 = time.monotonic()
+    deadline = t0 + timeout
+    while True:
+        left = deadline - time.monotonic()
+        try:
+            with socket.create_connection((host, port), timeout=max(left, RETRY_S),
+                                          source_address=source) as s:
+                s.sendall(cmd.encode() + b"\n")
+                reply = FrameReader(s).readline().strip()
+                if reply:
+                    return reply, time.monotonic() - t0
+        except OSError:
+            pass
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"server {host}:{port} not ready after {timeout:.0f}s")
+        time.sleep(RETRY_S)
+
+
+def reset(host, port, timeout=READY_TIMEOUT, source=None):
+    """RESET the server once it is up; returns the seconds spent waiting."""
+    reply, waited = command(host, port, "RESET", timeout, source)
+    if reply != protocol.RESET_REPLY:
+        raise ConnectionError(f"unexpected RESET reply {reply!r}")
+    return waited
+
+
+def ping(host, port, timeout=READY_TIMEOUT, source=None):
+    """Wait until the server answers PING; returns the seconds spent waiting."""
+    reply, waited = command(host, port, "PING", timeout, source)
+    if reply != protocol.PING_REPLY:
+        raise ConnectionError(f"unexpected PING reply {reply!r}")
+    return waited
+
+
+def stats(host, port, timeout=READY_TIMEOUT, source=None):
+    """The server's STATS counters as a dict."""
+    reply, _ = command(host, port, "STATS", timeout, source)
+    return json.loads(reply)
@@ -0,0 +1,164 @@
+"""Word corpus shared by the Python servers.
+
+The file is kept as one immutable bytes buffer plus an array of word start
+offsets, so a "p,k" request is answered with a memoryview into the original
+bytes instead of slicing a list of str and joining it again.
+"""
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+EOF_LINE = b"EOF\n"
+
+
+class Corpus:
+    """Words of a file, optionally repeated `repeat` times back to back.
+
+    Repetition is virtual: logical word i is base word i % base_n, and slices
+    that cross a copy boundary are served as several views of the same
+    buffer, so memory does not grow with `repeat`.
+    """
+
+    def __init__(self, filename, repeat=1, count_index=False):
+        with open(filename, "rb") as f:
+            raw = f.read()
+        self.filename = filename
+        # Where the stripped data starts in the file, for sendfile().
+        self.file_start = len(raw) - len(raw.lstrip())
+        # Keep a trailing comma in the buffer so a view of a whole copy can be
+        # followed directly by the next copy.
+        self.buf = memoryview(raw.strip() + b",")
+        self.view = self.buf[:-1]
+
+        # offsets[i] is where word i starts; offsets[base_n] is one past the
+        # trailing comma, so word i spans offsets[i] .. offsets[i + 1] - 1.
+        offsets = array("Q", [0])
+        data = self.buf.obj
+        pos = data.find(b",")
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = data.find(b",", pos + 1)
+        self.offsets = offsets
+        self.base_n = len(offsets) - 1
+        self.repeat = max(1, repeat)
+        self.n = self.base_n * self.repeat
+        # Content hash served by VERSION; clients key their range caches by it.
+        h = hashlib.blake2b(self.view, digest_size=12)
+        h.update(b"x%d" % self.repeat)
+        self.version = h.hexdigest()
+        self.vocab = None           # COUNT index, see build_count_index()
+        self.index_lock = threading.Lock()
+        if count_index:
+            self.build_count_index()
+
+    def build_count_index(self):
+        """Word ids of the base words plus, per vocabulary word, the sorted
+        positions where it occurs: O(base_n) memory in all. counts() builds
+        it on the first COUNT, so servers that never get one never pay."""
+        with self.index_lock:
+            if self.vocab is not None:
+                return
+            ids = array("I")
+            index = {}
+            positions = []
+            for pos, w in enumerate(self.view.tobytes().split(b",")):
+                v = index.get(w)
+                if v is None:
+                    v = index[w] = len(positions)
+                    positions.append(array("I"))
+                positions[v].append(pos)
+                ids.append(v)
+            self.ids = ids
+            self.positions = positions
+            self.vocab = list(index)    # last: counts() checks it without the lock
+
+    def counts(self, p, end):
+        """[(word, count)] for words [p, end), zero counts left out."""
+        if self.vocab is None:
+            self.build_count_index()
+        bn = self.base_n
+        totals = [0] * len(self.vocab)
+
+        def add(i, j):
+            # Short ranges are tallied directly, long ones by bisecting
+            # every word's positions.
+            if j - i <= len(totals):
+                for v in self.ids[i:j]:
+                    totals[v] += 1
+            else:
+                for v, pos in enumerate(self.positions):
+                    totals[v] += bisect_left(pos, j) - bisect_left(pos, i)
+
+        copy, i = divmod(p, bn)
+        last_copy, j = divmod(end, bn)
+        if copy == last_copy:
+            add(i, j)
+        else:
+            add(i, bn)
+            full = last_copy - copy - 1
+            if full:
+                for v, pos in enumerate(self.positions):
+                    totals[v] += full * len(pos)
+            add(0, j)
+        return [(word, c) for word, c in zip(self.vocab, totals) if c]
+
+    def __len__(self):
+        return self.n
+
+    def words(self, p, end):
+        """Buffers holding the comma-separated words [p, end), without copying."""
+        off = self.offsets
+        copy, i = divmod(p, self.base_n)
+        last_copy, j = divmod(end, self.base_n)
+        if copy == last_copy:
+            return [self.view[off[i]:off[j] - 1]]
+
+        parts = [self.buf[off[i]:]]
+        parts.extend([self.buf] * (last_copy - copy - 1))
+        if j:
+            parts.append(self.view[:off[j] - 1])
+        else:
+            parts[-1] = parts[-1][:-1]
+        return parts
+
+    def chunk_end(self, p, nbytes):
+        """End of a run of words from p that takes about nbytes of the file:
+        at least one word, and never past the end of p's copy."""
+        if p >= self.n:
+            return p
+        copy, i = divmod(p, self.base_n)
+        off = self.offsets
+        j = bisect_right(off, off[i] + nbytes, i + 1, self.base_n + 1) - 1
+        return copy * self.base_n + max(j, i + 1)
+
+    def file_ranges(self, p, end):
+        """(file_offset, count) byte ranges of words [p, end), one per copy.
+
+        Ranges exclude the comma that separates them; the sender puts it back.
+        """
+        off = self.offsets
+        while p < end:
+            copy, i = divmod(p, self.base_n)
+            stop = min(end, (copy + 1) * self.base_n)
+            j = stop - copy * self.base_n
+            yield self.file_start + off[i], off[j] - 1 - off[i]
+            p = stop
+
+    def response(self, p, k):
+        """Buffers making up the reply line for "p,k", EOF marker included.
+
+        Same output as ",".join(words[p:p+k] (+ ["EOF"])) + "\\n" on the
+        old list-of-str corpus.
+        """
+        n = self.n
+        if p < 0 or p >= n:
+            return [EOF_LINE]
+
+        end = min(p + k, n) if k > 0 else p
+        parts = self.words(p, end) if end > p else []
+        if p + k >= n:
+            parts.append(b",EOF\n" if parts else EOF_LINE)
+        else:
+            parts.append(b"\n")
+        return parts
@@ -0,0 +1,165 @@
+"""Incremental framing over one preallocated bytearray.
+
+FrameReader receives straight into its buffer with recv_into and hands out
+complete frames (text lines, binary requests, binary responses) by moving a
+start offset, so consuming a frame never shifts the bytes behind it. The
+newline search resumes where the previous one stopped, so a long reply that
+arrives in many segments is scanned once, not once per segment. The unread
+tail is moved to the front only when the buffer is full, and the buffer
+doubles only when a single frame does not fit.
+
+Servers call fill() once per readable event and drain with lines(),
+requests() or next_frame(); clients use the blocking readline()/read_frame(),
+or readlines() to take every reply of a pipelined burst per fill().
+"""
+from . import protocol
+
+DEFAULT_SIZE = 64 * 1024
+SPLIT_LINE = 768    # readlines() splits bursts whose first line is shorter
+
+
+class FrameReader:
+    __slots__ = ("sock", "buf", "view", "start", "end", "scan")
+
+    def __init__(self, sock=None, size=DEFAULT_SIZE):
+        self.sock = sock
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0      # first unconsumed byte
+        self.end = 0        # one past the last received byte
+        self.scan = 0       # start <= scan, and no "\n" in buf[start:scan]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def _make_room(self, need=1):
+        if self.start == self.end:
+            self.start = self.end = self.scan = 0
+        if len(self.buf) - self.end >= need:
+            return
+        if self.start:
+            n = self.end - self.start
+            self.view[:n] = self.view[self.start:self.end].tobytes()
+            self.scan -= self.start
+            self.start, self.end = 0, n
+        while len(self.buf) - self.end < need:
+            self.view.release()
+            self.buf.extend(bytes(len(self.buf)))
+            self.view = memoryview(self.buf)
+
+    def fill(self, sock=None):
+        """One recv_into at the end of the buffer; returns bytes read (0 = EOF)."""
+        self._make_room()
+        n = (sock or self.sock).recv_into(self.view[self.end:])
+        self.end += n
+        return n
+
+    def feed(self, data):
+        """Append bytes that were obtained some other way."""
+        self._make_room(len(data))
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def peek(self, n):
+        return self.view[self.start:min(self.end, self.start + n)].tobytes()
+
+    def skip(self, n):
+        self.start += min(n, len(self))
+        self.scan = max(self.scan, self.start)
+
+    def take(self, n):
+        """The next n bytes, or None if fewer are buffered."""
+        if self.end - self.start < n:
+            return None
+        data = self.view[self.start:self.start + n].tobytes()
+        self.start += n
+        self.scan = max(self.scan, self.start)
+        return data
+
+    def next_line(self, keepends=False):
+        """The next complete line (without its "\\n" unless keepends), or None."""
+        i = self.buf.find(b"\n", self.scan, self.end)
+        if i < 0:
+            self.scan = self.end
+            return None
+        start = self.start
+        self.start = self.scan = i + 1
+        return self.view[start:i + 1 if keepends else i].tobytes()
+
+    def lines(self):
+        """Every complete line buffered so far, split in one pass."""
+        i = self.buf.rfind(b"\n", self.scan, self.end)
+        if i < 0:
+            self.scan = self.end
+            return []
+        lines = self.view[self.start:i].tobytes().split(b"\n")
+        self.start = self.scan = i + 1
+        return lines
+
+    def requests(self):
+        """Every complete binary request as an (op, p, k) tuple."""
+        size = protocol.REQ.size
+        while self.end - self.start >= size:
+            req = protocol.REQ.unpack_from(self.buf, self.start)
+            self.start += size
+            yield req
+        self.scan = max(self.scan, self.start)
+
+    def next_frame(self):
+        """The next complete binary response as (flags, payload), or None."""
+        hsize = protocol.RESP.size
+        if self.end - self.start < hsize:
+            return None
+        flags, length = protocol.RESP.unpack_from(self.buf, self.start)
+        if self.end - self.start < hsize + length:
+            return None
+        body = self.start + hsize
+        payload = self.view[body:body + length].tobytes()
+        self.start = body + length
+        self.scan = max(self.scan, self.start)
+        return flags, payload
+
+    # Blocking helpers for clients; the reader must have been given a socket.
+
+    def readline(self):
+        """Like a file's readline(): the line with its "\\n", b"" at EOF."""
+        while True:
+            i = self.buf.find(b"\n", self.scan, self.end)
+            if i >= 0:
+                start = self.start
+                self.start = self.scan = i + 1
+                return self.view[start:i + 1].tobytes()
+            self.scan = self.end
+            if not self.fill():
+                return self.take(len(self)) or b""
+
+    def readlines(self):
+        """Every complete line buffered (without "\\n"), receiving until there
+        is at least one; [] if the peer closed first."""
+        while True:
+            buf, view, end = self.buf, self.view, self.end
+            start = self.start
+            i = buf.find(b"\n", self.scan, end)
+            if 0 <= i < start + SPLIT_LINE:
+                return self.lines()     # short lines: one split() for the burst
+            if i >= 0:
+                # Long lines: copy each out once rather than copy and split.
+                lines = []
+                while i >= 0:
+                    lines.append(view[start:i].tobytes())
+                    start = i + 1
+                    i = buf.find(b"\n", start, end)
+                self.start = self.scan = start
+                return lines
+            self.scan = end
+            if not self.fill():
+                return []
+
+    def read_frame(self):
+        """(flags, payload) for the next response, None if the peer closed first."""
+        while True:
+            frame = self.next_frame()
+            if frame is not None:
+                return frame
+            if not self.fill():
+                return None
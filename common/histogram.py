@@ -0,0 +1,180 @@
+"""Per-client queueing-delay and service-time histograms for the servers.
+
+Each request is stamped with time.monotonic_ns() when it is read (arrival),
+when a worker takes it off the scheduler queue (dispatch) and when its reply
+has been handed to the kernel (done). Per client the server then keeps three
+histograms in microseconds:
+
+  queue    dispatch - arrival   time spent waiting behind other requests
+  service  done - dispatch      time spent being served and sent
+  total    done - arrival
+
+The histograms are log-linear like HdrHistogram: values below 2 * SUB are
+exact and every power of two above that is split into SUB buckets, so any
+value is off by at most 1/SUB (about 3%) and a few hundred counters cover
+anything from 1 us to hours. Recording is a bit_length, a shift and a list
+increment. Each worker thread writes to its own histograms, so recording
+takes no lock; snapshot() merges them.
+
+The servers write snapshot() to a JSON file (config "latency_file") when
+they get RESET, i.e. at the end of a run in a sweep, and when they exit.
+"""
+import atexit
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+SUB_BITS = 5
+SUB = 1 << SUB_BITS
+PERCENTILES = (50, 90, 99, 99.9)
+DEFAULT_FILE = "logs/latency.json"
+KINDS = ("queue", "service", "total")
+
+
+def bucket(v):
+    if v < 2 * SUB:
+        return v
+    shift = v.bit_length() - SUB_BITS - 1
+    return shift * SUB + (v >> shift)
+
+
+def bucket_high(i):
+    """Largest value that falls into bucket i."""
+    if i < 2 * SUB:
+        return i
+    shift = i // SUB - 1
+    return ((i - shift * SUB + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def record(self, v):
+        """Add one value (a non-negative int, here microseconds)."""
+        i = bucket(v)
+        counts = self.counts
+        if i >= len(counts):
+            counts.extend([0] * (i + 1 - len(counts)))
+        counts[i] += 1
+        self.count += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile."""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * q // 100))     # ceil(count * q / 100)
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(bucket_high(i), self.max)
+        return self.max
+
+    def snapshot(self):
+        out = {"count": self.count,
+               "mean_us": round(self.sum / self.count, 1) if self.count else 0.0,
+               "max_us": self.max}
+        for q in PERCENTILES:
+            out[f"p{q:g}_us"] = self.percentile(q)
+        return out
+
+
+class LatencyRecorder:
+    """Queue/service/total histograms per client, one set per thread."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []            # every thread's {client: (queue, service, total)}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def _shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def record(self, client, arrived, dispatched, done):
+        """Account one request from its monotonic_ns() stamps."""
+        shard = self._shard()
+        hists = shard.get(client)
+        if hists is None:
+            hists = shard[client] = (LatencyHistogram(), LatencyHistogram(), LatencyHistogram())
+        hists[0].record((dispatched - arrived) // 1000)
+        hists[1].record((done - dispatched) // 1000)
+        hists[2].record((done - arrived) // 1000)
+
+    def merged(self):
+        """{client: (queue, service, total)} over all threads."""
+        out = {}
+        with self.lock:
+            shards = list(self.shards)
+        for shard in shards:
+            for client, hists in list(shard.items()):
+                mine = out.setdefault(client, tuple(LatencyHistogram() for _ in KINDS))
+                for into, h in zip(mine, hists):
+                    into.merge(h)
+        return out
+
+    def snapshot(self):
+        per_client = self.merged()
+        overall = tuple(LatencyHistogram() for _ in KINDS)
+        for hists in per_client.values():
+            for into, h in zip(overall, hists):
+                into.merge(h)
+        return {
+            "started": self.started,
+            "ended": time.time(),
+            "clients": {client: dict(zip(KINDS, (h.snapshot() for h in hists)))
+                        for client, hists in sorted(per_client.items())},
+            "all": dict(zip(KINDS, (h.snapshot() for h in overall))),
+        }
+
+    def clear(self):
+        # Samples recorded concurrently with a clear may land in either run.
+        with self.lock:
+            for shard in self.shards:
+                shard.clear()
+        self.started = time.time()
+
+    def dump(self, path):
+        """Write snapshot() to path if anything was recorded; then clear."""
+        snap = self.snapshot()
+        if snap["all"]["total"]["count"]:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(snap, f, indent=1)
+            os.replace(tmp, path)
+        self.clear()
+
+
+def dump_at_exit(recorder, path):
+    """Dump on normal exit and on SIGTERM, which is how the runners stop
+    the server."""
+    atexit.register(recorder.dump, path)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
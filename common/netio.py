@@ -0,0 +1,68 @@
+"""Socket helpers shared by the Python servers."""
+import socket
+
+from common import protocol
+from common.corpus import EOF_LINE
+
+# Hold a small write back until the payload that follows it (Linux only).
+MSG_MORE = getattr(socket, "MSG_MORE", 0)
+
+
+def send_parts(sock, parts):
+    """sendall() for a list of buffers, using scatter/gather sendmsg.
+
+    The buffers (typically memoryviews into a Corpus) go to the kernel as-is;
+    nothing is joined or encoded in user space. Returns the bytes sent.
+    """
+    bufs = [memoryview(b) for b in parts]
+    total = sum(len(b) for b in bufs)
+    i = 0
+    while i < len(bufs):
+        sent = sock.sendmsg(bufs[i:i + 64])     # stay well under IOV_MAX
+        while i < len(bufs) and sent >= len(bufs[i]):
+            sent -= len(bufs[i])
+            i += 1
+        if sent:
+            bufs[i] = bufs[i][sent:]
+    return total
+
+
+def send_stream(sock, corpus, p, end=None, binary=False, f=None, first=True):
+    """Push words [p, end) straight from the corpus file with sendfile().
+
+    With end=None this is the whole "STREAM p" reply: in text mode one long
+    line ending in ",EOF\n", in binary mode one frame per corpus copy with
+    FLAG_EOF on the last. A partial range (end < len) is a fragment of that
+    reply, so a scheduler can interleave a stream with other clients'
+    requests: text fragments after the first (first=False) start with ","
+    and binary fragments are non-EOF frames. The comma or frame header is
+    sent with MSG_MORE so it leaves in the same segment as the words after
+    it. f is an open corpus file to reuse across fragments.
+    Returns the bytes sent.
+    """
+    n = len(corpus)
+    end = n if end is None else min(end, n)
+    if p >= n:
+        return send_parts(sock, protocol.frame([], True) if binary else [EOF_LINE])
+
+    total = 0
+    own = f is None
+    if own:
+        f = open(corpus.filename, "rb")
+    try:
+        for offset, count in corpus.file_ranges(p, end):
+            head = protocol.RESP.pack(0, count) if binary else (b"" if first else b",")
+            if head:
+                sock.sendall(head, MSG_MORE)
+                total += len(head)
+            total += sock.sendfile(f, offset, count)
+            first = False
+    finally:
+        if own:
+            f.close()
+
+    if end == n:
+        tail = protocol.RESP.pack(protocol.FLAG_EOF, 0) if binary else b",EOF\n"
+        sock.sendall(tail)
+        total += len(tail)
+    return total
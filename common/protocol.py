@@ -0,0 +1,221 @@
+"""Opt-in binary framing for the word servers.
+
+A client selects binary mode by sending MAGIC as the first bytes of the
+connection; text requests ("p,k\\n") never start with a NUL byte, so the
+server can tell the two apart from the first byte. After that:
+
+  request:  REQ  = op (u8), p (u64), k (u32)          -- fixed 13 bytes
+  response: RESP = flags (u8), length (u32), payload  -- payload is the
+            comma-separated words, without "EOF" or a trailing newline;
+            FLAG_EOF marks the last frame of the corpus.
+
+Both sides therefore parse a message with one struct unpack, and a reader
+knows the payload size up front instead of scanning for "\\n".
+"""
+import json
+import struct
+
+MAGIC = b"\x00WCB"
+
+REQ = struct.Struct("!BQI")
+RESP = struct.Struct("!BI")
+
+OP_GET = 1
+OP_STREAM = 2       # k is ignored: push everything from p to the end
+OP_COUNT = 3        # word frequencies of [p, p+k) instead of the words
+OP_VERSION = 4      # corpus version token; p and k are ignored
+OP_RESET = 5        # start a new run on a live server; answered with "OK"
+OP_PING = 6         # liveness; answered with "PONG" without queueing
+OP_STATS = 7        # server counters as one JSON object, without queueing
+
+FLAG_EOF = 0x01
+
+MAX_K = 2 ** 32 - 1     # largest k a request header can carry
+
+
+def is_binary_hello(buf):
+    """True/False once the first byte decides the mode, None if undecided."""
+    if not buf:
+        return None
+    if buf[0] != MAGIC[0]:
+        return False
+    if len(buf) < len(MAGIC):
+        return None
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError("bad binary protocol magic")
+    return True
+
+
+def parse_text(line):
+    """Map a text request line to the (op, p, k) tuple a binary client sends.
+
+    "p,k" is a GET; "STREAM p" asks for everything from word p onwards;
+    "COUNT p,k" asks for word counts of that range; "VERSION" asks for the
+    corpus version token; "RESET" starts a new run; "PING" and "STATS" ask
+    for liveness and server counters. Raises ValueError for anything else.
+    """
+    if line[:1].isalpha():
+        cmd, _, arg = line.partition(" ")
+        cmd = cmd.upper()
+        if cmd == "VERSION":
+            return OP_VERSION, 0, 0
+        if cmd == "RESET":
+            return OP_RESET, 0, 0
+        if cmd == "PING":
+            return OP_PING, 0, 0
+        if cmd == "STATS":
+            return OP_STATS, 0, 0
+        if cmd == "STREAM":
+            return OP_STREAM, int(arg), 0
+        if cmd == "COUNT":
+            p, k = map(int, arg.split(","))
+            return OP_COUNT, p, k
+        raise ValueError(f"unknown command {cmd!r}")
+    p, k = map(int, line.split(","))
+    return OP_GET, p, k
+
+
+def encode_request(p, k, op=OP_GET):
+    return REQ.pack(op, p, k)
+
+
+def frame(parts, eof):
+    """Prefix a list of payload buffers with a response header."""
+    length = sum(len(b) for b in parts)
+    return [RESP.pack(FLAG_EOF if eof else 0, length)] + parts
+
+
+def get_frame(corpus, p, k):
+    """Binary counterpart of Corpus.response for OP_GET."""
+    n = len(corpus)
+    if p >= n:
+        return frame([], True)
+    end = min(p + k, n)
+    parts = corpus.words(p, end) if end > p else []
+    return frame(parts, p + k >= n)
+
+
+def count_payload(corpus, p, k):
+    """COUNT reply body: "word,count" pairs joined by ";"."""
+    n = len(corpus)
+    end = min(p + k, n)
+    pairs = corpus.counts(p, end) if end > p else []
+    return b";".join(w + b"," + str(c).encode() for w, c in pairs)
+
+
+def count_response(corpus, p, k):
+    """Text COUNT reply; ends in ";EOF" when the range reaches the end."""
+    if p >= len(corpus):
+        return [b"EOF\n"]
+    body = count_payload(corpus, p, k)
+    if p + k >= len(corpus):
+        body += b";EOF" if body else b"EOF"
+    return [body + b"\n"]
+
+
+def count_frame(corpus, p, k):
+    if p >= len(corpus):
+        return frame([], True)
+    return frame([count_payload(corpus, p, k)], p + k >= len(corpus))
+
+
+def version_response(corpus):
+    return [corpus.version.encode() + b"\n"]
+
+
+def version_frame(corpus):
+    return frame([corpus.version.encode()], False)
+
+
+RESET_REPLY = b"OK"
+
+
+def reset_response():
+    return [RESET_REPLY + b"\n"]
+
+
+def reset_frame():
+    return frame([RESET_REPLY], False)
+
+
+PING_REPLY = b"PONG"
+
+
+def ping_response():
+    return [PING_REPLY + b"\n"]
+
+
+def ping_frame():
+    return frame([PING_REPLY], False)
+
+
+def stats_payload(stats):
+    return json.dumps(stats, separators=(",", ":"), sort_keys=True).encode()
+
+
+def stats_response(stats):
+    """STATS reply: the counters as one line of JSON."""
+    return [stats_payload(stats) + b"\n"]
+
+
+def stats_frame(stats):
+    return frame([stats_payload(stats)], False)
+
+
+def fetch_version(sock, binary=False):
+    """Client side of VERSION on a fresh connection: the token as a str."""
+    from .framing import FrameReader     # framing imports this module
+
+    reader = FrameReader(sock)
+    if binary:
+        sock.sendall(MAGIC + encode_request(0, 0, OP_VERSION))
+        frame = reader.read_frame()
+        body = frame[1] if frame else b""
+    else:
+        sock.sendall(b"VERSION\n")
+        body = reader.readline().strip()
+    if not body:
+        raise ConnectionError("server closed before answering VERSION")
+    return body.decode()
+
+
+def parse_counts(body):
+    """Inverse of count_payload: {word: count} from b"w,c;w,c"."""
+    counts = {}
+    for pair in body.split(b";"):
+        if pair and pair != b"EOF":
+            w, c = pair.rsplit(b",", 1)
+            counts[w.decode()] = int(c)
+    return counts
+
+
+def fetch_counts(sock, p=0, binary=False):
+    """Client side of COUNT: word counts of everything from p, with as few
+    requests as the header allows (one, for any real corpus)."""
+    from .framing import FrameReader     # framing imports this module
+
+    counts = {}
+    reader = FrameReader(sock)
+    if binary:
+        sock.sendall(MAGIC)
+    while True:
+        if binary:
+            sock.sendall(encode_request(p, MAX_K, OP_COUNT))
+            frame = reader.read_frame()
+            if frame is None:
+                raise ConnectionError("server closed the connection before EOF")
+            flags, body = frame
+            eof = flags & FLAG_EOF
+        else:
+            sock.sendall(f"COUNT {p},{MAX_K}\n".encode())
+            line = reader.readline()
+            if not line.endswith(b"\n"):
+                raise ConnectionError("server closed the connection before EOF")
+            body = line.strip()
+            eof = not body or body.endswith(b"EOF")
+        for w, c in parse_counts(body).items():
+            counts[w] = counts.get(w, 0) + c
+        if eof:
+            return counts
+        p += MAX_K
+
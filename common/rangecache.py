@@ -0,0 +1,110 @@
+"""On-disk cache of downloaded word ranges, keyed by corpus version.
+
+Layout under root/<version>/:
+
+  <start>-<end>   the comma-separated words [start, end), as received
+  EOF             the corpus length n, once a reply carrying EOF was seen
+
+A client asks the server for VERSION first, replays whatever the cache holds
+from its start offset and only downloads the rest, feeding each reply back
+with put(). Replies arrive in offset order, so put() appends to one open run
+file and memory stays constant. Runs are written under a temporary name and
+renamed when complete, so clients sharing a directory never read a partial
+run. A changed corpus has a different version and simply misses.
+"""
+import os
+
+DEFAULT_DIR = ".range_cache"
+CHUNK = 1 << 20
+
+
+class RangeCache:
+    def __init__(self, root, version):
+        self.dir = os.path.join(root, version)
+        os.makedirs(self.dir, exist_ok=True)
+        self.runs = {}              # start -> end of complete runs on disk
+        self.n = None
+        for name in os.listdir(self.dir):
+            start, sep, end = name.partition("-")
+            if name == "EOF":
+                with open(os.path.join(self.dir, name)) as f:
+                    self.n = int(f.read())
+            elif sep and start.isdigit() and end.isdigit():
+                self.runs[int(start)] = int(end)
+        self.run = None             # [start, end, file] being appended to
+
+    def _run_at(self, p):
+        for start, end in self.runs.items():
+            if start <= p < end:
+                return start, end
+        return None
+
+    def replay(self, p, consume):
+        """Pass cached words from p onwards to consume() in comma-separated
+        chunks; returns (first uncached offset, whether that is the end)."""
+        while True:
+            run = self._run_at(p)
+            if run is None:
+                break
+            start, end = run
+            skip = p - start
+            tail = b""
+            with open(os.path.join(self.dir, f"{start}-{end}"), "rb") as f:
+                while True:
+                    block = f.read(CHUNK)
+                    if not block:
+                        break
+                    data = tail + block
+                    cut = data.rfind(b",")
+                    if cut < 0:
+                        tail = data
+                        continue
+                    body, tail = data[:cut], data[cut + 1:]
+                    if skip:
+                        parts = body.split(b",", skip)
+                        if len(parts) <= skip:
+                            skip -= len(parts)
+                            continue
+                        body, skip = parts[-1], 0
+                    consume(body)
+            if tail:
+                if skip:
+                    skip -= 1
+                else:
+                    consume(tail)
+            p = end
+        return p, self.n is not None and p >= self.n
+
+    def put(self, p, payload, eof):
+        """Record the reply to a request at offset p."""
+        words = payload.count(b",") + 1 if payload else 0
+        if words:
+            if self.run is None or self.run[1] != p:
+                self._close_run()
+                path = os.path.join(self.dir, f".{p}.{os.getpid()}.tmp")
+                self.run = [p, p, open(path, "wb")]
+            else:
+                self.run[2].write(b",")
+            self.run[2].write(payload)
+            self.run[1] = p + words
+        if eof and (self.n is None or p + words < self.n):
+            self.n = p + words
+            self._atomic_write("EOF", str(self.n).encode())
+
+    def _close_run(self):
+        if self.run is None:
+            return
+        start, end, f = self.run
+        f.close()
+        os.replace(f.name, os.path.join(self.dir, f"{start}-{end}"))
+        self.runs[start] = end
+        self.run = None
+
+    def _atomic_write(self, name, data):
+        tmp = os.path.join(self.dir, f".{name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.dir, name))
+
+    def close(self):
+        self._close_run()
@@ -0,0 +1,180 @@
+"""Columnar store for experiment results, and the vectorised analysis the
+runners and plot scripts share.
+
+Everything goes into one npz file at the repo root (results.npz), as one
+array per column of these tables:
+
+  runs      part, x, run, metric, value
+            one row per run, what the per-part CSVs hold (x is k, c or
+            num_clients; metric is "jfi" or "elapsed_ms")
+  clients   part, x, run, client, rogue, completion_ms
+            every client's completion time, so JFI or percentiles can be
+            recomputed over any grouping later
+  latency   part, x, run, client, kind, count, mean_us, p50_us, p90_us,
+            p99_us, p999_us, max_us
+            the server's per-client histogram snapshot for each run
+            (kind is queue, service or total; see common/histogram.py)
+  segments  connections, segment_size, run, elapsed_ms
+            part2's segmented-download sweep (run_experiments_part2.py
+            --segments)
+
+Every row also carries `session`, the start time of the sweep that wrote
+it, so later sweeps add to the file and plots can pick the latest one. A
+ResultStore buffers rows as Python lists and writes the whole file once per
+save(), instead of reopening a CSV for every row.
+"""
+import os
+import time
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results.npz")
+Z95 = 1.96      # normal approximation, as the plots have always used
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_PATH, session=None):
+        self.path = path
+        self.session = time.time() if session is None else session
+        self.pending = {}           # table -> {column: list}
+
+    def add(self, table, **columns):
+        """Append rows. List/array columns give one row per element; scalar
+        columns are repeated for every row."""
+        seqs = [len(v) for v in columns.values() if isinstance(v, (list, tuple, np.ndarray))]
+        n = max(seqs, default=1)
+        if not n:
+            return
+        columns["session"] = self.session
+        cols = self.pending.setdefault(table, {})
+        if cols and set(cols) != set(columns):
+            raise ValueError(f"{table}: columns {sorted(columns)} != {sorted(cols)}")
+        for name, v in columns.items():
+            if isinstance(v, (list, tuple, np.ndarray)):
+                if len(v) != n:
+                    raise ValueError(f"{table}.{name}: {len(v)} values for {n} rows")
+                cols.setdefault(name, []).extend(v)
+            else:
+                cols.setdefault(name, []).extend([v] * n)
+
+    def add_latency(self, part, x, run, snapshot):
+        """Rows for one common.histogram snapshot (a server latency file)."""
+        rows = [(client, kind, h) for client, kinds in snapshot["clients"].items()
+                for kind, h in kinds.items()]
+        if not rows:
+            return
+        clients, kinds, hists = zip(*rows)
+        self.add("latency", part=part, x=x, run=run, client=list(clients), kind=list(kinds),
+                 **{col: [h[col] for h in hists] for col in
+                    ("count", "mean_us", "p50_us", "p90_us", "p99_us", "max_us")},
+                 p999_us=[h["p99.9_us"] for h in hists])
+
+    def save(self):
+        """Merge the buffered rows into the file in one write."""
+        if not self.pending:
+            return
+        tables = load(self.path)
+        for table, cols in self.pending.items():
+            new = {name: np.asarray(vals) for name, vals in cols.items()}
+            old = tables.get(table)
+            if old is not None and set(old) == set(new):
+                new = {name: np.concatenate([old[name], new[name]]) for name in new}
+            elif old is not None:
+                raise ValueError(f"{self.path}: table {table} has columns {sorted(old)}")
+            tables[table] = new
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **{f"{table}.{name}": arr
+                                      for table, cols in tables.items()
+                                      for name, arr in cols.items()})
+        os.replace(tmp, self.path)
+        self.pending = {}
+
+
+def load(path=DEFAULT_PATH):
+    """{table: {column: array}}; empty if the file does not exist."""
+    tables = {}
+    if not os.path.exists(path):
+        return tables
+    with np.load(path) as z:
+        for key in z.files:
+            table, name = key.split(".", 1)
+            tables.setdefault(table, {})[name] = z[key]
+    return tables
+
+
+def select(cols, latest=True, **match):
+    """Rows of a table whose columns equal the given values; with latest,
+    only those from the newest session among them."""
+    keep = np.ones(len(cols["session"]), dtype=bool)
+    for name, value in match.items():
+        keep &= cols[name] == value
+    if latest and keep.any():
+        keep &= cols["session"] == cols["session"][keep].max()
+    return {name: arr[keep] for name, arr in cols.items()}
+
+
+def load_runs(part, csv_path, x_col, y_col, path=DEFAULT_PATH):
+    """(x, y) of the latest sweep of `part` from the store, or from the
+    part's CSV if the store has none (results from before the store)."""
+    runs = load(path).get("runs")
+    if runs is not None:
+        rows = select(runs, part=part, metric=y_col)
+        if len(rows["x"]):
+            return rows["x"], rows["value"]
+    data = np.genfromtxt(csv_path, delimiter=",", names=True, ndmin=1)
+    return data[x_col], data[y_col]
+
+
+def group_index(*keys):
+    """Dense group ids for rows keyed by one or more equal-length columns;
+    returns (unique keys, ids)."""
+    if len(keys) == 1:
+        return np.unique(keys[0], return_inverse=True)
+    rec = np.rec.fromarrays(keys)
+    uniq, ids = np.unique(rec, return_inverse=True)
+    return uniq, ids
+
+
+def jfi(times, groups=None):
+    """Jain's fairness index of utilities 1/t (higher is better).
+
+    With groups (dense ids from group_index) returns one JFI per group,
+    otherwise a single float. Non-positive times count as 1 us."""
+    u = 1.0 / np.maximum(np.asarray(times, dtype=float), 1e-6)
+    if groups is None:
+        return float(u.sum() ** 2 / (len(u) * (u * u).sum())) if len(u) else 0.0
+    n = np.bincount(groups)
+    s = np.bincount(groups, u)
+    s2 = np.bincount(groups, u * u)
+    return s * s / (n * s2)
+
+
+def group_stats(x, y):
+    """Per distinct x: mean, sample std, count, sem and 95% CI half-width of y."""
+    uniq, ids = np.unique(x, return_inverse=True)
+    y = np.asarray(y, dtype=float)
+    n = np.bincount(ids)
+    mean = np.bincount(ids, y) / n
+    dev2 = np.bincount(ids, (y - mean[ids]) ** 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(dev2 / (n - 1))       # NaN for single runs, like pandas
+    sem = std / np.sqrt(n)
+    return {"x": uniq, "mean": mean, "std": std, "count": n, "sem": sem, "ci95": Z95 * sem}
+
+
+def group_percentiles(x, y, qs=(50, 90, 99)):
+    """Per distinct x: linearly interpolated percentiles of y, one array per q."""
+    uniq, ids = np.unique(x, return_inverse=True)
+    y = np.asarray(y, dtype=float)
+    order = np.lexsort((y, ids))
+    ys = y[order]
+    n = np.bincount(ids)
+    start = np.concatenate([[0], np.cumsum(n)[:-1]])
+    out = {"x": uniq}
+    for q in qs:
+        pos = start + (n - 1) * (q / 100.0)
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, start + n - 1)
+        out[f"p{q:g}"] = ys[lo] + (ys[hi] - ys[lo]) * (pos - lo)
+    return out
@@ -0,0 +1,64 @@
+"""Live server counters behind the PING and STATS commands.
+
+Every server keeps one ServerStats and answers PING/STATS as soon as the
+request is read, without going through its request queue, so a STATS taken
+while a greedy client floods the server shows the queues as they are rather
+than after the flood has drained. Each server adds its own scheduler state
+(FCFS queue depth, per-client DRR queues) through the `extra` callable.
+"""
+import threading
+import time
+
+from common import protocol
+
+CONTROL_OPS = (protocol.OP_PING, protocol.OP_STATS)
+
+
+class ServerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0           # replies fully sent
+        self.bytes_sent = 0
+        self.connections = 0        # open right now
+        self.accepted = 0
+
+    def opened(self):
+        with self.lock:
+            self.connections += 1
+            self.accepted += 1
+
+    def closed(self):
+        with self.lock:
+            self.connections -= 1
+
+    def served(self, nbytes, requests=1):
+        """Count a reply of nbytes; requests=0 for part of a longer reply."""
+        with self.lock:
+            self.requests += requests
+            self.bytes_sent += nbytes
+
+    def snapshot(self, **extra):
+        with self.lock:
+            out = {
+                "uptime_s": round(time.monotonic() - self.started, 3),
+                "requests": self.requests,
+                "bytes_sent": self.bytes_sent,
+                "connections": self.connections,
+                "accepted": self.accepted,
+            }
+        out.update(extra)
+        return out
+
+
+def control_reply(stats, op, binary, extra=dict):
+    """Reply buffers for PING/STATS, or None if op is not one of them.
+
+    extra() is only called for STATS and returns the server's own fields.
+    """
+    if op == protocol.OP_PING:
+        return protocol.ping_frame() if binary else protocol.ping_response()
+    if op == protocol.OP_STATS:
+        snap = stats.snapshot(**extra())
+        return protocol.stats_frame(snap) if binary else protocol.stats_response(snap)
+    return None
@@ -0,0 +1,127 @@
+"""Compact binary request traces, recorded by the part3/part4 servers and
+replayed by tools/replay.py.
+
+With config "trace_file" set, a server appends one fixed-size record per
+data request (GET, STREAM, COUNT) as it reads it off the socket:
+
+  t_us     Q   arrival, microseconds after the first request in the trace
+  client   I   client IPv4 address
+  conn     I   connection number, unique within the server process
+  op       B   protocol op, | BINARY_FLAG if the connection spoke binary
+  p        Q
+  k        I
+
+29 bytes per request after a short header (MAGIC, format version and the
+wall-clock time of t_us = 0). Control requests (RESET, PING, STATS,
+VERSION) are not traced, and neither are requests whose p or k does not
+fit its field (e.g. a text "-1,5"); those are counted in
+TraceRecorder.dropped instead, since recording must never fail on the
+server's I/O thread. Like the latency histograms the trace is kept in
+memory and written to the file when the server gets RESET, i.e. at the end
+of each run of a sweep, and when it exits; see common/histogram.py.
+"""
+import collections
+import os
+import socket
+import struct
+import threading
+import time
+
+from common import protocol
+
+MAGIC = b"WCTR"
+VERSION = 1
+HEADER = struct.Struct("!4sBd")
+RECORD = struct.Struct("!QIIBQI")
+BINARY_FLAG = 0x80
+P_MAX = (1 << 64) - 1
+K_MAX = (1 << 32) - 1
+TRACED_OPS = (protocol.OP_GET, protocol.OP_STREAM, protocol.OP_COUNT)
+
+TraceRecord = collections.namedtuple("TraceRecord", "t_us client conn op binary p k")
+
+
+class TraceRecorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buf = bytearray()
+        self.first_ns = None        # monotonic_ns() of t_us = 0
+        self.started = None         # the same instant as wall-clock time
+        self.addrs = {}             # client IP -> packed int
+        self.dropped = 0            # requests not recorded since the last dump
+
+    def record(self, client, conn, req, binary, arrived):
+        """Append one request: an (op, p, k) tuple or a text request line.
+        Unparseable and control requests are skipped; this never raises."""
+        try:
+            self._append(client, conn, req, binary, arrived)
+        except Exception:
+            with self.lock:
+                self.dropped += 1
+
+    def _append(self, client, conn, req, binary, arrived):
+        if not isinstance(req, tuple):
+            try:
+                req = protocol.parse_text(req)
+            except ValueError:
+                return
+        op, p, k = req
+        if op not in TRACED_OPS:
+            return
+        if not (0 <= p <= P_MAX and 0 <= k <= K_MAX):
+            with self.lock:
+                self.dropped += 1
+            return
+        addr = self.addrs.get(client)
+        if addr is None:
+            try:
+                addr = int.from_bytes(socket.inet_aton(client), "big")
+            except OSError:
+                addr = 0
+            self.addrs[client] = addr
+        if binary:
+            op |= BINARY_FLAG
+        with self.lock:
+            if self.first_ns is None:
+                self.first_ns = arrived
+                self.started = time.time() - (time.monotonic_ns() - arrived) / 1e9
+            t_us = max(0, arrived - self.first_ns) // 1000
+            self.buf += RECORD.pack(t_us, addr, conn, op, p, k)
+
+    def dump(self, path):
+        """Write the trace to path if anything was recorded; then clear."""
+        with self.lock:
+            buf, started, dropped = self.buf, self.started, self.dropped
+            self.buf = bytearray()
+            self.first_ns = self.started = None
+            self.dropped = 0
+        if dropped:
+            print(f"[trace] {dropped} requests could not be recorded")
+        if not buf:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, started))
+            f.write(buf)
+        os.replace(tmp, path)
+
+
+def load(path):
+    """(wall-clock start, [TraceRecord, ...]) in arrival order."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: not a trace file")
+    magic, version, started = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a version {VERSION} trace file")
+    body = memoryview(data)[HEADER.size:]
+    if len(body) % RECORD.size:
+        raise ValueError(f"{path}: truncated record")
+    records = [
+        TraceRecord(t_us, socket.inet_ntoa(addr.to_bytes(4, "big")), conn,
+                    op & ~BINARY_FLAG, bool(op & BINARY_FLAG), p, k)
+        for t_us, addr, conn, op, p, k in RECORD.iter_unpack(body)
+    ]
+    return started, records
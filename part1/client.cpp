@@ -13,6 +13,8 @@
 
 using namespace std;
 
+extern char **environ;
+
 
 map<string, string> load_config(const string &filename) {
     ifstream file(filename);
@@ -38,11 +40,40 @@ map<string, string> load_config(const string &filename) {
     return config;
 }
 
-int main() {
+// Same precedence as common/config.py: the file (--config, default
+// config.json), then WC_<KEY> environment variables, then --set key=value.
+map<string, string> load_config(int argc, char **argv) {
+    string filename = "config.json";
+    for (int i = 1; i + 1 < argc; i++)
+        if (string(argv[i]) == "--config") filename = argv[i + 1];
+    map<string, string> config = load_config(filename);
+
+    for (char **env = environ; *env; env++) {
+        string var(*env);
+        size_t eq = var.find('=');
+        if (var.compare(0, 3, "WC_") != 0 || eq == string::npos) continue;
+        string key = var.substr(3, eq - 3);
+        transform(key.begin(), key.end(), key.begin(), ::tolower);
+        config[key] = var.substr(eq + 1);
+    }
+
+    for (int i = 1; i + 1 < argc; i++) {
+        if (string(argv[i]) != "--set") continue;
+        string pair(argv[i + 1]);
+        size_t eq = pair.find('=');
+        if (eq != string::npos) config[pair.substr(0, eq)] = pair.substr(eq + 1);
+    }
+    return config;
+}
+
+int main(int argc, char **argv) {
     using namespace std::chrono;
     auto start = high_resolution_clock::now();
     
-    auto config = load_config("config.json");
+    auto config = load_config(argc, argv);
+    bool quiet = false;     // --quiet: only print ELAPSED_MS
+    for (int i = 1; i < argc; i++)
+        if (string(argv[i]) == "--quiet") quiet = true;
 
     string server_ip = config["server_ip"];
     int server_port = stoi(config["server_port"]);
@@ -84,8 +115,10 @@ DONE:
     auto end = high_resolution_clock::now();
     auto elapsed = duration_cast<milliseconds>(end - start).count();
 
-    for (auto &it : freq) {
-        cout << it.first << ", " << it.second << endl;
+    if (!quiet) {
+        for (auto &it : freq) {
+            cout << it.first << ", " << it.second << endl;
+        }
     }
     cout << "ELAPSED_MS:" << elapsed << endl;
     return 0;
@@ -1,23 +1,24 @@
 # demo_runner.py
-import json, os, time, pathlib
+import os, sys, time
 from topo_wordcount import make_net
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import config as wc_config
+
 K = int(os.environ.get("K", "5"))
 P = int(os.environ.get("P", "0"))
 
-# load base config and override p
-cfg = json.loads(pathlib.Path("config.json").read_text())
-cfg["p"] = P
-pathlib.Path("demo_config.json").write_text(json.dumps(cfg))
+# p and k go on the command line; config.json is left as it is
+overrides = wc_config.set_args({"p": P, "k": K})
 
 net = make_net(); net.start()
 h1, h2 = net.get('h1'), net.get('h2')
 
-# start server with demo config
-srv = h2.popen("./server --config demo_config.json", shell=True)
+# start server
+srv = h2.popen("./server", shell=True)
 time.sleep(0.5)
 
 # run client once (no --quiet): prints word frequencies + ELAPSED_MS
-print(h1.cmd(f"./client --config demo_config.json --k {K}"))
+print(h1.cmd(f"./client {overrides}"))
 
 srv.terminate(); time.sleep(0.2); net.stop()
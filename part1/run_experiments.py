@@ -1,12 +1,18 @@
 # STARTER CODE ONLY. EDIT AS DESIRED
 #!/usr/bin/env python3
+import os
 import re
+import sys
 import time
 import csv
-import json
+import argparse
 from pathlib import Path
 from topo_wordcount import make_net
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.results import ResultStore
+from common import config as wc_config
+
 # Config
 K_VALUES = []
 val = 1
@@ -22,26 +28,16 @@ while val <= 100:
         val += 20    # step of 10
 
 RUNS_PER_K = 5
-SERVER_CMD = "./server --config config.json"
-CLIENT_CMD_TMPL = "./client --config config.json --quiet"
+SERVER_CMD = "./server"
+CLIENT_CMD_TMPL = "./client --quiet"
 
 RESULTS_CSV = Path("results.csv")
 
+def main(config_file="config.json", overrides=()):
+    # k goes to each client launch as --set k=...; config.json is only read
+    wc_config.load(config_file, overrides)
+    sets = wc_config.parse_sets(overrides)
 
-def modify_config(key, value, filename="config.json"):
-    """Update a key in config.json with the given value."""
-    # Load existing config
-    with open(filename, "r") as f:
-        config = json.load(f)
-
-    # Update the key
-    config[key] = value
-
-    # Write back to file
-    with open(filename, "w") as f:
-        json.dump(config, f, indent=2)
-
-def main():
     # Prepare CSV
     if not RESULTS_CSV.exists():
         with RESULTS_CSV.open("w", newline="") as f:
@@ -58,15 +54,18 @@ def main():
     if not Path("words.txt").exists():
         Path("words.txt").write_text("cat,bat,cat,dog,dog,emu,emu,emu,ant\n")
 
+    store = ResultStore()
+    rows = []   # appended to RESULTS_CSV in one write at the end
+
     # Start server
-    srv = h2.popen(SERVER_CMD, shell=True, stdout=None, stderr=None)
+    srv = h2.popen(f"{SERVER_CMD} {wc_config.set_args(sets, config_file)}", shell=True,
+                   stdout=None, stderr=None)
     time.sleep(0.5)  # give it a moment to bind
 
     try:
         for k in K_VALUES:
             for r in range(1, RUNS_PER_K + 1):
-                modify_config("k", k) # should implement this function
-                cmd = CLIENT_CMD_TMPL
+                cmd = f"{CLIENT_CMD_TMPL} {wc_config.set_args({**sets, 'k': k}, config_file)}"
                 out = h1.cmd(cmd)
                 # parse ELAPSED_MS
                 m = re.search(r"ELAPSED_MS:(\d+)", out)
@@ -74,13 +73,19 @@ def main():
                     print(f"[warn] No ELAPSED_MS found for k={k} run={r}. Raw:\n{out}")
                     continue
                 ms = int(m.group(1))
-                with RESULTS_CSV.open("a", newline="") as f:
-                    csv.writer(f).writerow([k, r, ms])
+                rows.append([k, r, ms])
+                store.add("runs", part="part1", x=k, run=r, metric="elapsed_ms", value=ms)
                 print(f"k={k} run={r} elapsed_ms={ms}")
     finally:
         srv.terminate()
         time.sleep(0.2)
         net.stop()
+        store.save()
+        with RESULTS_CSV.open("a", newline="") as f:
+            csv.writer(f).writerows(rows)
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    wc_config.add_arguments(ap)
+    args = ap.parse_args()
+    main(args.config, args.set)
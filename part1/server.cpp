@@ -12,6 +12,8 @@
 
 using namespace std;
 
+extern char **environ;
+
 vector<string> words;
 
 
@@ -43,6 +45,32 @@ map<string, string> load_config(const string &filename) {
     return config;
 }
 
+// Same precedence as common/config.py: the file (--config, default
+// config.json), then WC_<KEY> environment variables, then --set key=value.
+map<string, string> load_config(int argc, char **argv) {
+    string filename = "config.json";
+    for (int i = 1; i + 1 < argc; i++)
+        if (string(argv[i]) == "--config") filename = argv[i + 1];
+    map<string, string> config = load_config(filename);
+
+    for (char **env = environ; *env; env++) {
+        string var(*env);
+        size_t eq = var.find('=');
+        if (var.compare(0, 3, "WC_") != 0 || eq == string::npos) continue;
+        string key = var.substr(3, eq - 3);
+        transform(key.begin(), key.end(), key.begin(), ::tolower);
+        config[key] = var.substr(eq + 1);
+    }
+
+    for (int i = 1; i + 1 < argc; i++) {
+        if (string(argv[i]) != "--set") continue;
+        string pair(argv[i + 1]);
+        size_t eq = pair.find('=');
+        if (eq != string::npos) config[pair.substr(0, eq)] = pair.substr(eq + 1);
+    }
+    return config;
+}
+
 void load_words(const string &filename) {
     ifstream file(filename);
     string line;
@@ -73,8 +101,8 @@ string handle_request(int p, int k) {
     return ss.str();
 }
 
-int main() {
-    auto config = load_config("config.json");
+int main(int argc, char **argv) {
+    auto config = load_config(argc, argv);
 
     string server_ip = config["server_ip"];
     int server_port = stoi(config["server_port"]);
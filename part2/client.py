@@ -1,37 +1,135 @@
 #!/usr/bin/env python3
+import argparse
+import os
 import socket
 import sys
+import threading
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import protocol
+from common.framing import FrameReader
+from common.autotune import KTuner
+from common import config as wc_config
 
-def load_config(filename="config.json"):
-    config = {}
-    with open(filename) as f:
-        for line in f:
-            line = line.strip().strip(",")
-            if not line or line[0] in "{}":
-                continue
-            key, val = line.split(":", 1)
-            key = key.strip().strip('"')
-            val = val.strip().strip('"')
-            config[key] = val
-    return config
 
-
-config = load_config("config.json")
+config = wc_config.from_argv()
 
 SERVER_IP = config["server_ip"]
-SERVER_PORT = int(config["server_port"])
-P = int(config["p"])
-K = int(config["k"])
+SERVER_PORT = config["server_port"]
+P = config["p"]
+K = config["k"]
+PROTOCOL = config.get("protocol", "text")   # "text" or "binary"
+BIND_IP = None      # source address (--bind-ip), e.g. per-client loopback IPs
+
+def connect():
+    src = (BIND_IP, 0) if BIND_IP else None
+    return socket.create_connection((SERVER_IP, SERVER_PORT), source_address=src)
+
+def fetch_segment(s, reader, p, k):
+    """One p,k request on an open connection: (payload bytes, eof)."""
+    if PROTOCOL == "binary":
+        s.sendall(protocol.encode_request(p, k))
+        frame = reader.read_frame()
+        if frame is None:
+            raise ConnectionError(f"server closed the connection before range {p},{k}")
+        flags, payload = frame
+        return payload, bool(flags & protocol.FLAG_EOF)
+
+    s.sendall(f"{p},{k}\n".encode())
+    line = reader.readline()
+    if not line:
+        raise ConnectionError(f"server closed the connection before range {p},{k}")
+    line = line.strip()
+    if line == b"EOF" or not line:
+        return b"", True
+    if line.endswith(b",EOF"):
+        return line[:-4], True
+    return line, False
+
+def segmented_download(connections, segment_size, tuner=None):
+    """Split [P, len) into segment_size-word ranges and fetch them over
+    `connections` keep-alive connections at once, like a segmented HTTP
+    downloader. Workers claim the next free range until one of them sees
+    EOF, then the ranges are joined back in offset order. With a tuner the
+    size of each new range is tuner.k instead of segment_size."""
+    segments = {}
+    next_p = [P]
+    lock = threading.Lock()
+    eof_p = [None]
+    errors = []
+
+    def worker():
+        try:
+            with connect() as s:
+                if PROTOCOL == "binary":
+                    s.sendall(protocol.MAGIC)
+                reader = FrameReader(s)
+                while True:
+                    with lock:
+                        p = next_p[0]
+                        if eof_p[0] is not None and p > eof_p[0]:
+                            return
+                        k = tuner.k if tuner else segment_size
+                        next_p[0] += k
+                    t0 = time.monotonic()
+                    payload, eof = fetch_segment(s, reader, p, k)
+                    with lock:
+                        segments[p] = payload
+                        if eof and (eof_p[0] is None or p < eof_p[0]):
+                            eof_p[0] = p
+                        if tuner:
+                            tuner.observe(k, time.monotonic() - t0)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(connections)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors or eof_p[0] is None:
+        raise RuntimeError(f"download failed: {errors[0] if errors else 'no EOF'}")
+
+    return b",".join(segments[p] for p in sorted(segments) if p <= eof_p[0] and segments[p])
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--download", action="store_true",
+                    help="Fetch the whole file as parallel ranges instead of one p,k request")
+    ap.add_argument("--connections", type=int, default=4,
+                    help="Concurrent connections for --download")
+    ap.add_argument("--segment-size", type=int, default=K,
+                    help="Words per range for --download (default: k)")
+    ap.add_argument("--auto-k", action="store_true",
+                    help="Tune the range size during --download, starting at --segment-size")
+    ap.add_argument("--bind-ip", default=None, help="Local address to connect from")
+    wc_config.add_arguments(ap)
+    args = ap.parse_args()
+    global BIND_IP
+    BIND_IP = args.bind_ip
+
+    if args.download:
+        tuner = KTuner(k=args.segment_size, samples=args.connections) if args.auto_k else None
+        start = time.time()
+        data = segmented_download(args.connections, args.segment_size, tuner)
+        elapsed_ms = int((time.time() - start) * 1000)
+        print(f"WORDS:{data.count(b',') + 1 if data else 0}")
+        print(f"ELAPSED_MS:{elapsed_ms}")
+        if tuner:
+            print(f"K_TRAJECTORY:{tuner.trajectory()}")
+        return
+
     start = time.time()
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((SERVER_IP, SERVER_PORT))
-        req = f"{P},{K}\n"
-        s.sendall(req.encode())
-        data = s.recv(4096).decode().strip()
+    with connect() as s:
+        reader = FrameReader(s)
+        if PROTOCOL == "binary":
+            s.sendall(protocol.MAGIC + protocol.encode_request(P, K))
+            reader.read_frame()     # only the time to the reply is reported
+        else:
+            req = f"{P},{K}\n"
+            s.sendall(req.encode())
+            reader.readline()
     end = time.time()
 
     elapsed_ms = int((end - start) * 1000)
@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
-import pandas as pd
+import os
+import sys
 import matplotlib.pyplot as plt
 
-df = pd.read_csv("results_p2.csv")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.results import load_runs, group_stats
 
-agg = df.groupby("num_clients")["elapsed_ms"].agg(["mean", "std", "count"]).reset_index()
-agg["sem"] = agg["std"] / agg["count"].pow(0.5)
-agg["ci95"] = 1.96 * agg["sem"]
+x, elapsed = load_runs("part2", "results_p2.csv", "num_clients", "elapsed_ms")
+agg = group_stats(x, elapsed)
 
 plt.figure()
-plt.errorbar(agg["num_clients"], agg["mean"], yerr=agg["ci95"], fmt='o-', capsize=4)
+plt.errorbar(agg["x"], agg["mean"], yerr=agg["ci95"], fmt='o-', capsize=4)
 plt.xlabel("Number of concurrent clients")
 plt.ylabel("Average completion time per client (ms)")
 plt.title("Concurrent Clients vs Completion Time (avg ± 95% CI, n=5)")
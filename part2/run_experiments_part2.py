@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
+import argparse
+import os
 import re
+import sys
 import time
 import csv
 from pathlib import Path
 from subprocess import PIPE, TimeoutExpired
-from world_topocount import make_net   # your topology file
-from config_utils import modify_config # helper without json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.results import ResultStore
+from common import config as wc_config
 
 # Config
 NUM_CLIENTS_LIST = list(range(1, 33, 4))  # 1,5,9,..., 32
@@ -14,6 +19,11 @@ SERVER_CMD = "python3 server.py"
 CLIENT_CMD = "python3 client.py"
 RESULTS_CSV = Path("results_p2.csv")
 
+# Single-client segmented download sweep (--segments)
+CONNECTIONS_LIST = [1, 2, 4, 8, 16, 32]
+SEGMENT_SIZES = [5, 20, 100, 500]
+SEGMENTS_CSV = Path("results_p2_segments.csv")
+
 COMM_TIMEOUT = 10  # seconds to wait for a client process to finish & produce output
 
 def safe_get_output(proc):
@@ -42,29 +52,44 @@ def safe_get_output(proc):
             out = str(out)
     return out
 
-def main():
-    # Prepare CSV header
-    if not RESULTS_CSV.exists():
-        with RESULTS_CSV.open("w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["num_clients", "run", "elapsed_ms"])
+def record(store, rows, nclients, run, names, elapsed):
+    """Keep one run: its CSV row and every client's completion time.
+    Returns the average elapsed time."""
+    avg_ms = sum(elapsed) / len(elapsed)
+    rows.append([nclients, run, avg_ms])
+    store.add("runs", part="part2", x=nclients, run=run, metric="elapsed_ms", value=avg_ms)
+    store.add("clients", part="part2", x=nclients, run=run, client=names,
+              rogue=False, completion_ms=elapsed)
+    return avg_ms
+
+def flush(store, rows, csv_path=RESULTS_CSV, header=("num_clients", "run", "elapsed_ms")):
+    """Write the results store, then append rows to csv_path in one write."""
+    store.save()
+    new = not csv_path.exists()
+    with csv_path.open("a", newline="") as f:
+        w = csv.writer(f)
+        if new:
+            w.writerow(header)
+        w.writerows(rows)
 
+def main(config_args=""):
+    """config_args (--config/--set options) go to every server and client."""
+    from world_topocount import make_net   # your topology file
+    store = ResultStore()
+    rows = []   # appended to RESULTS_CSV in one write at the end
     net = None
     try:
         for nclients in NUM_CLIENTS_LIST:
-            # update config.json
-            modify_config("num_clients", nclients)
-
             # rebuild network with correct number of clients
             if net:
                 net.stop()
-            net = make_net()
+            net = make_net(num_clients=nclients)
             net.start()
             hS = net.get("hS")
 
             for r in range(1, RUNS_PER_SETTING + 1):
                 # Start server in hS
-                srv = hS.popen(SERVER_CMD, shell=True)
+                srv = hS.popen(f"{SERVER_CMD} {config_args}", shell=True)
                 time.sleep(0.5)  # wait for bind
 
                 # Start all clients in parallel, capture stdout/stderr via PIPE
@@ -72,17 +97,19 @@ def main():
                 for i in range(1, nclients + 1):
                     h = net.get(f"h{i}")
                     # Request a subprocess with pipes so communicate() returns output
-                    proc = h.popen(CLIENT_CMD, shell=True, stdout=PIPE, stderr=PIPE, text=True)
+                    proc = h.popen(f"{CLIENT_CMD} {config_args}", shell=True, stdout=PIPE, stderr=PIPE, text=True)
                     procs.append((h, proc))
 
                 # Collect results from all clients
                 elapsed_list = []
+                names = []
                 for h, proc in procs:
                     out = safe_get_output(proc)
                     # debug: print(client output)  # enable if you want to see outputs
                     m = re.search(r"ELAPSED_MS:(\d+)", out)
                     if m:
                         elapsed_list.append(int(m.group(1)))
+                        names.append(h.name)
 
                 # Stop server for this run
                 try:
@@ -95,14 +122,63 @@ def main():
                     print(f"[warn] No results for num_clients={nclients} run={r}")
                     continue
 
-                avg_ms = sum(elapsed_list) / len(elapsed_list)
-                with RESULTS_CSV.open("a", newline="") as f:
-                    csv.writer(f).writerow([nclients, r, avg_ms])
+                avg_ms = record(store, rows, nclients, r, names, elapsed_list)
                 print(f"num_clients={nclients} run={r} avg_elapsed_ms={avg_ms:.2f}")
 
     finally:
         if net:
             net.stop()
+        flush(store, rows)
+
+def run_segment_sweep(config_args=""):
+    """One client, segmented download over every (connections, segment size)
+    pair; reports the pair with the lowest mean completion time."""
+    from world_topocount import make_net
+    store = ResultStore()
+    rows = []
+    net = make_net(num_clients=1)
+    net.start()
+    means = {}
+    try:
+        hS, h1 = net.get("hS"), net.get("h1")
+        srv = hS.popen(f"{SERVER_CMD} {config_args}", shell=True)
+        time.sleep(0.5)  # wait for bind
+        try:
+            for conns in CONNECTIONS_LIST:
+                for seg in SEGMENT_SIZES:
+                    runs = []
+                    for r in range(1, RUNS_PER_SETTING + 1):
+                        out = h1.cmd(f"{CLIENT_CMD} --download --connections {conns} --segment-size {seg} {config_args}")
+                        m = re.search(r"ELAPSED_MS:(\d+)", out)
+                        if not m:
+                            print(f"[warn] No ELAPSED_MS for connections={conns} segment={seg} run={r}")
+                            continue
+                        runs.append(int(m.group(1)))
+                        rows.append([conns, seg, r, runs[-1]])
+                        store.add("segments", connections=conns, segment_size=seg, run=r,
+                                  elapsed_ms=runs[-1])
+                    if runs:
+                        means[(conns, seg)] = sum(runs) / len(runs)
+                        print(f"connections={conns} segment={seg} avg_elapsed_ms={means[(conns, seg)]:.2f}")
+        finally:
+            srv.terminate()
+    finally:
+        net.stop()
+        flush(store, rows, SEGMENTS_CSV, ("connections", "segment_size", "run", "elapsed_ms"))
+
+    if means:
+        (conns, seg), ms = min(means.items(), key=lambda kv: kv[1])
+        print(f"Best: connections={conns} segment_size={seg} avg_elapsed_ms={ms:.2f}")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segments", action="store_true",
+                    help="Sweep (connections, segment size) for one segmented-download client")
+    wc_config.add_arguments(ap)
+    args = ap.parse_args()
+    wc_config.load(args.config, args.set)      # fail now on a bad file or override
+    config_args = wc_config.set_args(wc_config.parse_sets(args.set), args.config)
+    if args.segments:
+        run_segment_sweep(config_args)
+    else:
+        main(config_args)
@@ -1,66 +1,132 @@
 #!/usr/bin/env python3
+import os
 import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.corpus import Corpus, EOF_LINE
+from common.netio import send_parts, send_stream
+from common import protocol
+from common.stats import ServerStats, control_reply
+from common import config as wc_config
 
-def load_config(filename="config.json"):
-    config = {}
-    with open(filename) as f:
-        for line in f:
-            line = line.strip().strip(",")
-            if not line or line[0] in "{}":
-                continue
-            key, val = line.split(":", 1)
-            key = key.strip().strip('"')
-            val = val.strip().strip('"')
-            config[key] = val
-    return config
 
-
-config = load_config("config.json")
+config = wc_config.from_argv()
 
 SERVER_IP = config["server_ip"]
-SERVER_PORT = int(config["server_port"])
+SERVER_PORT = config["server_port"]
 FILENAME = config["filename"]
+MODE = config.get("mode", "serial")      # "serial" or "pool"
+WORKERS = config.get("workers", 32)
+BACKLOG = config.get("backlog", 128)
+
+
+corpus = Corpus(FILENAME)
+stats = ServerStats()
 
+def serve_request(conn, req, binary=False):
+    op, p, k = req
+    control = control_reply(stats, op, binary, lambda: {"mode": MODE, "workers": WORKERS})
+    if control is not None:
+        sent = send_parts(conn, control)
+    elif op == protocol.OP_STREAM:
+        sent = send_stream(conn, corpus, p, binary=binary)
+    elif op == protocol.OP_COUNT:
+        sent = send_parts(conn, (protocol.count_frame if binary else protocol.count_response)(corpus, p, k))
+    elif op == protocol.OP_VERSION:
+        sent = send_parts(conn, (protocol.version_frame if binary else protocol.version_response)(corpus))
+    elif op == protocol.OP_RESET:
+        sent = send_parts(conn, protocol.reset_frame() if binary else protocol.reset_response())
+    elif op != protocol.OP_GET:
+        sent = send_parts(conn, protocol.frame([], True) if binary else [EOF_LINE])
+    elif binary:
+        sent = send_parts(conn, protocol.get_frame(corpus, p, k))
+    else:
+        sent = send_parts(conn, corpus.response(p, k))
+    stats.served(sent)
 
-with open(FILENAME) as f:
-    words = f.read().strip().split(",")
+def serve_text(conn, data: str):
+    try:
+        req = protocol.parse_text(data)
+    except:
+        conn.sendall(EOF_LINE)
+        return
+    serve_request(conn, req)
 
 def handle_client(conn):
+    # Serial mode: one request per connection, text or (after
+    # protocol.MAGIC) binary. Errors only end this connection; the accept
+    # loop runs on the main thread, so nothing may escape from here.
     try:
-        data = conn.recv(1024).decode().strip()
-        if not data:
-            return
-        try:
-            p, k = map(int, data.split(","))
-        except:
-            conn.sendall(b"EOF\n")
-            return
+        with conn.makefile("rb") as rfile:
+            if rfile.peek(1)[:1] == protocol.MAGIC[:1]:
+                if rfile.read(len(protocol.MAGIC)) != protocol.MAGIC:
+                    return
+                hdr = rfile.read(protocol.REQ.size)
+                if len(hdr) == protocol.REQ.size:
+                    serve_request(conn, protocol.REQ.unpack(hdr), binary=True)
+                return
+            data = rfile.read1(1024).decode(errors="replace").strip()
+            if data:
+                serve_text(conn, data)
+    except Exception as e:
+        if not isinstance(e, OSError):
+            print(f"Error handling client: {e}")
+    finally:
+        conn.close()
+        stats.closed()
 
-        if p >= len(words):
-            conn.sendall(b"EOF\n")
+def serve_binary(conn, rfile):
+    if rfile.read(len(protocol.MAGIC)) != protocol.MAGIC:
+        return
+    while True:
+        hdr = rfile.read(protocol.REQ.size)
+        if len(hdr) < protocol.REQ.size:
             return
+        serve_request(conn, protocol.REQ.unpack(hdr), binary=True)
 
-        slice_words = words[p:p+k]
-        if p + k >= len(words):
-            slice_words.append("EOF")
-
-        response = ",".join(slice_words) + "\n"
-        conn.sendall(response.encode())
+def handle_keepalive(conn):
+    # Serve newline-delimited text requests (or binary frames, if the
+    # client opens with protocol.MAGIC) on one connection until the client
+    # closes its side.
+    try:
+        with conn.makefile("rb") as rfile:
+            if rfile.peek(1)[:1] == protocol.MAGIC[:1]:
+                serve_binary(conn, rfile)
+                return
+            for line in rfile:
+                data = line.decode().strip()
+                if not data:
+                    continue
+                serve_text(conn, data)
+    except OSError:
+        pass
     finally:
         conn.close()
+        stats.closed()
 
 def main():
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind((SERVER_IP, SERVER_PORT))
-        s.listen()
+        s.listen(BACKLOG)
+
+        print(f"Server listening on {SERVER_IP}:{SERVER_PORT} (mode={MODE})")
 
-        print(f"Server listening on {SERVER_IP}:{SERVER_PORT}")
+        if MODE == "serial":
+            while True:
+                conn, addr = s.accept()
+                stats.opened()
+                handle_client(conn)
 
-        while True:
-            conn, addr = s.accept()
-            handle_client(conn)  
+        # Bounded pool: at most WORKERS connections are served at once, the
+        # rest wait in the executor queue instead of in the listen backlog.
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            while True:
+                conn, addr = s.accept()
+                stats.opened()
+                pool.submit(handle_keepalive, conn)
 
 if __name__ == "__main__":
     main()
@@ -1,21 +1,12 @@
 #!/usr/bin/env python3
+import os
+import sys
 from mininet.topo import Topo
 from mininet.net import Mininet
 from mininet.node import OVSController
-import re
 
-def load_config(filename="config.json"):
-    config = {}
-    with open(filename) as f:
-        for line in f:
-            line = line.strip().strip(",")
-            if not line or line[0] in "{}":
-                continue
-            key, val = line.split(":", 1)
-            key = key.strip().strip('"')
-            val = val.strip().strip('"')
-            config[key] = val
-    return config
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import config as wc_config
 
 class WordcountTopo(Topo):
     def build(self, num_clients=1):
@@ -30,9 +21,10 @@ class WordcountTopo(Topo):
             client = self.addHost(f"h{i}", ip=f"10.0.0.{i+2}")
             self.addLink(client, switch)
 
-def make_net():
-    config = load_config("config.json")
-    num_clients = int(config.get("num_clients", 1))
+def make_net(num_clients=None):
+    """num_clients defaults to the config's (--config/--set, WC_NUM_CLIENTS)."""
+    if num_clients is None:
+        num_clients = wc_config.from_argv().get("num_clients", 1)
     topo = WordcountTopo(num_clients=num_clients)
     net = Mininet(topo=topo, controller=OVSController)
     return net
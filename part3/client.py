@@ -1,75 +1,215 @@
 #!/usr/bin/env python3
+import os
+import sys
 import socket
 import time
 import argparse
+import collections
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import protocol
+from common.framing import FrameReader
+from common.autotune import KTuner
+from common.rangecache import RangeCache, DEFAULT_DIR
+from common import config as wc_config
 
-def load_config(filename="config.json"):
-    cfg = {}
-    with open(filename) as f:
-        for line in f:
-            line = line.strip().strip(",")
-            if not line or line[0] in "{}":
-                continue
-            k, v = line.split(":", 1)
-            cfg[k.strip().strip('"')] = v.strip().strip('"')
-    return cfg
 
-cfg = load_config()
+cfg = wc_config.from_argv()
 SERVER_IP = cfg.get("server_ip", "10.0.0.100")
-SERVER_PORT = int(cfg.get("port", 8887))
-P = int(cfg.get("p", 0))
-K = int(cfg.get("k", 5))
-
-def download_file(batch_size: int):
+SERVER_PORT = cfg.get("port", 8887)
+P = cfg.get("p", 0)
+K = cfg.get("k", 5)
+PROTOCOL = cfg.get("protocol", "text")
+BIND_IP = None      # source address (--bind-ip), e.g. per-client loopback IPs
+
+def connect():
+    src = (BIND_IP, 0) if BIND_IP else None
+    return socket.create_connection((SERVER_IP, SERVER_PORT), source_address=src)
+
+def read_replies(reader: FrameReader, binary: bool):
+    """Yield replies as (payload, eof). payload is the comma-separated words
+    as bytes, without the EOF marker. Text replies are split out a whole
+    burst at a time. Raises ConnectionError if the server closes the
+    connection first, so a cut-short download is never reported as complete."""
+    while True:
+        if binary:
+            frame = reader.read_frame()
+            if frame is None:
+                raise ConnectionError("server closed the connection before EOF")
+            flags, payload = frame
+            yield payload, bool(flags & protocol.FLAG_EOF)
+            continue
+
+        lines = reader.readlines()
+        if not lines:
+            raise ConnectionError("server closed the connection before EOF")
+        for line in lines:
+            line = line.strip()
+            if line == b"EOF":
+                yield b"", True
+            elif line.endswith(b",EOF"):
+                yield line[:-4], True
+            else:
+                yield line, False
+
+def count_words(counts: collections.Counter, payload: bytes):
+    # Words are counted as bytes and dropped right away, so memory stays
+    # O(vocabulary) however long the file is.
+    if payload:
+        counts.update(w for w in payload.split(b",") if w)
+
+def decoded(counts: collections.Counter) -> dict:
+    return {w.decode(): c for w, c in counts.items()}
+
+def download_file(window: int, binary: bool = False, adaptive: bool = False,
+                  max_window: int = 64, tuner: KTuner = None, cache: RangeCache = None):
+    """Sliding-window download: keep `window` requests in flight and send a
+    new one as each reply arrives, so the pipe never drains between bursts.
+
+    With adaptive=True the window is re-sized once per window's worth of
+    replies, TCP-Vegas style: queued = window * (1 - base_rtt / rtt) estimates
+    how many of our requests are waiting at the server rather than in the
+    network. Fewer than one queued grows the window, more than three shrinks
+    it.
+
+    With a tuner, each new request asks for tuner.k words instead of K and
+    every reply's size and RTT are fed back to it.
+
+    With a cache, words it already holds are counted locally and only the
+    rest is requested; every reply is added to it.
+    """
 
     offset = P
-    all_words = []
-
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((SERVER_IP, SERVER_PORT))
-        buf = ""
-
+    counts = collections.Counter()
+    if cache:
+        offset, done = cache.replay(P, lambda payload: count_words(counts, payload))
+        if done:
+            return decoded(counts)
+    window = max(1, window)
+    in_flight = collections.deque()      # (send time, p, k) of outstanding requests
+    base_rtt = None
+    acked = 0
+
+    with connect() as s:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if binary:
+            s.sendall(protocol.MAGIC)
+        reader = FrameReader(s)
+
+        def fill():
+            nonlocal offset
+            reqs = []
+            while len(in_flight) < window:
+                k = tuner.k if tuner else K
+                if binary:
+                    reqs.append(protocol.encode_request(offset, k))
+                else:
+                    reqs.append(f"{offset},{k}\n".encode())
+                in_flight.append((time.monotonic(), offset, k))
+                offset += k
+            if reqs:
+                s.sendall(b"".join(reqs))
+
+        fill()
+        for payload, eof in read_replies(reader, binary):
+            sent, p, k = in_flight.popleft()
+            count_words(counts, payload)
+            if cache:
+                cache.put(p, payload, eof)
+            if eof:
+                return decoded(counts)
+
+            rtt = time.monotonic() - sent
+            if tuner:
+                tuner.observe(k, rtt)
+            if adaptive:
+                base_rtt = rtt if base_rtt is None else min(base_rtt, rtt)
+                acked += 1
+                if acked >= window:
+                    acked = 0
+                    queued = window * (1 - base_rtt / rtt) if rtt > 0 else 0
+                    if queued < 1 and window < max_window:
+                        window += 1
+                    elif queued > 3 and window > 1:
+                        window -= 1
+            fill()
+
+def stream_download(binary: bool):
+    """One STREAM request; the server pushes the rest of the file."""
+
+    counts = collections.Counter()
+
+    with connect() as s:
+
+        if binary:
+            s.sendall(protocol.MAGIC + protocol.encode_request(P, 0, protocol.OP_STREAM))
+            reader = FrameReader(s)
+            while True:
+                frame = reader.read_frame()
+                if frame is None:
+                    raise ConnectionError("server closed the connection before EOF")
+                flags, payload = frame
+                count_words(counts, payload)
+                if flags & protocol.FLAG_EOF:
+                    return decoded(counts)
+
+        s.sendall(f"STREAM {P}\n".encode())
+        tail = b""
         while True:
-
-            for _ in range(batch_size):
-                req = f"{offset},{K}\n"
-                s.sendall(req.encode())
-                offset += K
-
-
-            got = 0
-            while got < batch_size:
-                chunk = s.recv(4096)
-                if not chunk:
-                    return all_words 
-
-                buf += chunk.decode()
-                while "\n" in buf and got < batch_size:
-                    line, buf = buf.split("\n", 1)
-                    line = line.strip()
-                    if not line:
-                        continue
-                    got += 1
-
-                    if "EOF" in line:
-
-                        words_part = line.replace("EOF", "").rstrip(",")
-                        if words_part:
-                            all_words.extend([w for w in words_part.split(",") if w])
-                        return all_words
-                    else:
-                        all_words.extend([w for w in line.split(",") if w])
+            chunk = s.recv(65536)
+            if not chunk:
+                raise ConnectionError("server closed the connection before EOF")
+            # Everything up to the last comma is complete words; the rest may
+            # continue in the next chunk. The reply ends with "EOF\n".
+            *done, tail = (tail + chunk).split(b",")
+            counts.update(done)
+            if tail.endswith(b"\n"):
+                return decoded(counts)
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--batch-size", type=int, default=1,
-                    help="Back-to-back requests per burst (greedy uses c>1)")
+                    help="Requests kept in flight (greedy uses c>1)")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="Grow/shrink the window from observed RTT, starting at --batch-size")
+    ap.add_argument("--auto-k", action="store_true",
+                    help="Tune the chunk size k while downloading, starting at config k")
+    ap.add_argument("--cache", nargs="?", const=DEFAULT_DIR, default=None, metavar="DIR",
+                    help="Keep fetched ranges on disk keyed by the corpus VERSION "
+                         f"and only download what is missing (default dir: {DEFAULT_DIR})")
     ap.add_argument("--client-id", type=str, default="client")
+    ap.add_argument("--protocol", choices=["text", "binary"], default=PROTOCOL,
+                    help="Wire format; binary uses length-prefixed frames")
+    ap.add_argument("--stream", action="store_true",
+                    help="Fetch the whole file with one server-push STREAM request")
+    ap.add_argument("--count", action="store_true",
+                    help="Ask the server for word counts (COUNT) instead of the words")
+    ap.add_argument("--bind-ip", default=None, help="Local address to connect from")
+    wc_config.add_arguments(ap)
     args = ap.parse_args()
+    global BIND_IP
+    BIND_IP = args.bind_ip
 
     t0 = time.time()
-    _ = download_file(args.batch_size)
+    if args.count:
+        with connect() as s:
+            _ = protocol.fetch_counts(s, P, args.protocol == "binary")
+    elif args.stream:
+        _ = stream_download(args.protocol == "binary")
+    else:
+        binary = args.protocol == "binary"
+        tuner = KTuner(k=K, samples=args.batch_size) if args.auto_k else None
+        cache = None
+        if args.cache:
+            with connect() as s:
+                cache = RangeCache(args.cache, protocol.fetch_version(s, binary))
+        try:
+            _ = download_file(args.batch_size, binary, args.adaptive, tuner=tuner, cache=cache)
+        finally:
+            if cache:
+                cache.close()
+        if tuner:
+            print(f"K_TRAJECTORY:{tuner.trajectory()}")
     t1 = time.time()
 
 
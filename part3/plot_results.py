@@ -1,32 +1,30 @@
 #!/usr/bin/env python3
-import pandas as pd
+import os
+import sys
 import matplotlib.pyplot as plt
 from pathlib import Path
 
-RESULTS_CSV = Path("results_p3.csv")
-
-# Load results: columns = ["c", "run", "jfi"]
-df = pd.read_csv(RESULTS_CSV)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.results import load_runs, group_stats
 
-# Aggregate by c: mean, std, count
-agg = df.groupby("c")["jfi"].agg(["mean", "std", "count"]).reset_index()
+RESULTS_CSV = Path("results_p3.csv")
 
-# Standard error of the mean
-agg["sem"] = agg["std"] / agg["count"].pow(0.5)
+# Latest part3 sweep from the results store (or the CSV: c, run, jfi)
+c, jfi = load_runs("part3", RESULTS_CSV, "c", "jfi")
 
-# 95% confidence interval
-agg["ci95"] = 1.96 * agg["sem"]
+# Aggregate by c: mean, std, count, standard error and 95% confidence interval
+agg = group_stats(c, jfi)
 
 # Plot
 plt.figure(figsize=(8,5))
 plt.errorbar(
-    agg["c"], agg["mean"],
+    agg["x"], agg["mean"],
     yerr=agg["ci95"],
     fmt="o-", capsize=4, linewidth=2
 )
 plt.xlabel("c (number of back-to-back requests by greedy client)")
 plt.ylabel("Jain's Fairness Index (JFI)")
-plt.plot(agg["c"], agg["mean"], "o-", linewidth=2)
+plt.plot(agg["x"], agg["mean"], "o-", linewidth=2)
 plt.title("Fairness vs Greedy Client Requests (FCFS)")
 plt.ylim(0, 1.05)  # JFI is always between 0 and 1
 plt.grid(True, linestyle="--", alpha=0.7)
@@ -2,36 +2,44 @@
 
 import os
 import re
+import sys
 import time
 import glob
 import csv
-import numpy as np
+import argparse
+import json
+from contextlib import contextmanager
 from pathlib import Path
-from topology import create_network
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.results import ResultStore, jfi as fairness
+from common import config as wc_config
 
 RESULTS_CSV = Path("results_p3.csv")
+LOADGEN = "../tools/loadgen.py"
+SERVERCTL = "../tools/serverctl.py"
+LATENCY_FILE = "logs/latency.json"     # server config 'latency_file'
 
 class Runner:
-    def __init__(self, config_file='config.json', runs_per_c=1):
-        # --- Simple config parser (avoid json library) ---
-        config = {}
-        with open(config_file) as f:
-            for line in f:
-                line = line.strip().strip(",")
-                if not line or line[0] in "{}":
-                    continue
-                key, val = line.split(":", 1)
-                key = key.strip().strip('"')
-                val = val.strip().strip('"')
-                config[key] = val
+    def __init__(self, config_file='config.json', runs_per_c=1, loadgen=False, stats_interval=None,
+                 overrides=()):
+        config = wc_config.load(config_file, overrides)
+        # Every server/client/tool launch gets the same file and overrides
+        self.config_args = wc_config.set_args(wc_config.parse_sets(overrides), config_file)
 
         self.server_ip = config['server_ip']
-        self.port = int(config['port'])
-        self.num_clients = int(config['num_clients'])
-        self.c_max = int(config['c'])       # max c to test
-        self.p = int(config['p'])
-        self.k = int(config['k'])
+        self.port = config['port']
+        self.num_clients = config['num_clients']
+        self.c_max = config['c']       # max c to test
+        self.p = config['p']
+        self.k = config['k']
+        self.trace_file = config.get('trace_file')     # servers record requests there
         self.runs_per_c = runs_per_c
+        self.loadgen = loadgen      # one asyncio process instead of a host per client
+        self.stats_interval = stats_interval    # poll server STATS during runs
+        self.store = ResultStore()
+        self.results_csv = RESULTS_CSV
+        self.csv_rows = []          # written to results_csv in one go by flush()
 
         print(f"Config: {self.num_clients} clients, max c={self.c_max}, p={self.p}, k={self.k}")
 
@@ -42,8 +50,9 @@ class Runner:
         os.makedirs("logs", exist_ok=True)
 
     def parse_logs(self, exp_start):
-        """Return dict: {'rogue':[ms], 'normal':[ms,...]} using a common start."""
-        results = {'rogue': [], 'normal': []}
+        """Return dict: {'rogue':[ms], 'normal':[ms,...]} using a common start.
+        'names' lists the clients in rogue + normal order."""
+        results = {'rogue': [], 'normal': [], 'names': []}
 
         import re, os
 
@@ -61,12 +70,14 @@ class Runner:
         ms = finish_ms("logs/rogue.log")
         if ms is not None:
             results['rogue'].append(ms)
+            results['names'].append('rogue')
 
         # Normal clients
         for i in range(2, self.num_clients + 1):
             ms = finish_ms(f"logs/normal_{i}.log")
             if ms is not None:
                 results['normal'].append(ms)
+                results['names'].append(f"normal_{i}")
 
         return results
 
@@ -86,85 +97,179 @@ class Runner:
             print(f"[WARN] Expected {self.num_clients} times, got {len(all_times)}")
             return 0.0
 
-        arr = np.array(all_times, dtype=float)
-        arr[arr <= 0] = 1e-6
-        u = 1.0 / arr  # utilities
-        s = u.sum()
-        s2 = (u ** 2).sum()
-        n = len(u)
-        return (s * s) / (n * s2)
-
+        return fairness(all_times)
 
 
 
-    def run_experiment(self, c_value, run_id=1):
-        print(f"Running c={c_value}, run={run_id}")
-        self.cleanup_logs()
-        net = create_network(num_clients=self.num_clients)
 
+    @contextmanager
+    def live_network(self):
+        """A Mininet network with the server running; both stop on exit."""
+        from topology import create_network     # Mininet only when actually used
+        net = create_network(num_clients=1 if self.loadgen else self.num_clients)
+        server_proc = None
         try:
-            server = net.get('server')
-            clients = [net.get(f'client{i+1}') for i in range(self.num_clients)]
+            server_proc = net.get('server').popen(f"python3 server.py {self.config_args}", shell=True)
+            yield net
+        finally:
+            if server_proc is not None:
+                server_proc.terminate()
+                server_proc.wait()
+            net.stop()
+
+    def wait_ready(self, host):
+        """RESET the server from host, retrying until it answers."""
+        out = host.cmd(f"python3 {SERVERCTL} {self.config_args}")
+        if "READY_MS" not in out:
+            raise RuntimeError(f"server did not become ready: {out.strip()}")
 
-            # Start server
-            server_proc = server.popen("python3 server.py")
-            time.sleep(2)                         # warm up server
-            exp_start = time.time() 
+    def run_experiment(self, c_value, run_id=1):
+        """One run on its own network and server."""
+        with self.live_network() as net:
+            return self.run_once(net, c_value, run_id)
 
-            # Start rogue client
-            rogue_proc = clients[0].popen(
-                f"python3 client.py --batch-size {c_value} --client-id rogue > logs/rogue.log 2>&1",
+    def run_once(self, net, c_value, run_id=1):
+        print(f"Running c={c_value}, run={run_id}")
+        self.cleanup_logs()
+        clients = [net.get(f'client{i+1}') for i in range(len(net.hosts) - 1)]
+
+        self.wait_ready(clients[0])             # instead of a fixed warm-up sleep
+        exp_start = time.time()
+
+        watcher = self.start_stats(clients[0], c_value)
+        if self.loadgen:
+            procs = [self.start_loadgen(clients[0], c_value)]
+        else:
+            procs = self.start_clients(clients, c_value)
+
+        # Wait for clients; they have written their logs once they exit.
+        for proc in procs:
+            proc.wait()
+        if watcher:
+            watcher.terminate()
+            watcher.wait()
+        latency = self.save_latency(clients[0], f"logs/latency_c{c_value}_r{run_id}.json")
+        self.save_trace(f"logs/trace_c{c_value}_r{run_id}.bin")
+
+        # Parse logs & compute JFI
+        results = self.parse_logs(exp_start)   # <<< changed
+        jfi = self.calculate_jfi(results)
+        self.record(c_value, run_id, results, jfi, latency)
+
+        print(f"c={c_value}, run={run_id}, JFI={jfi:.3f}")
+        return jfi
+
+    def record(self, c_value, run_id, results, jfi, latency):
+        names = results['names']
+        self.csv_rows.append([c_value, run_id, jfi])
+        self.store.add("runs", part="part3", x=c_value, run=run_id, metric="jfi", value=jfi)
+        self.store.add("clients", part="part3", x=c_value, run=run_id, client=names,
+                       rogue=[n == 'rogue' for n in names],
+                       completion_ms=results['rogue'] + results['normal'])
+        if latency:
+            self.store.add_latency("part3", c_value, run_id, latency)
+
+    def flush(self):
+        """Write everything recorded so far: the results store and the CSV."""
+        self.store.save()
+        new = not self.results_csv.exists()
+        with self.results_csv.open("a", newline="") as f:
+            w = csv.writer(f)
+            if new:
+                w.writerow(["c", "run", "jfi"])
+            w.writerows(self.csv_rows)
+        self.csv_rows = []
+
+    def save_latency(self, host, path):
+        # A RESET makes the server write the histograms of the run that just
+        # ended to LATENCY_FILE (and clear them for the next one).
+        self.wait_ready(host)
+        if not os.path.exists(LATENCY_FILE):
+            return None
+        os.replace(LATENCY_FILE, path)
+        with open(path) as f:
+            snap = json.load(f)
+        lat = snap["all"]
+        print(f"queue p99={lat['queue']['p99_us']}us, service p99={lat['service']['p99_us']}us")
+        return snap
+
+    def save_trace(self, path):
+        # The RESET in save_latency also wrote the run's request trace, for
+        # tools/replay.py.
+        if self.trace_file and os.path.exists(self.trace_file):
+            os.replace(self.trace_file, path)
+
+    def start_clients(self, clients, c_value):
+        # Start rogue client
+        rogue_proc = clients[0].popen(
+            f"python3 client.py --batch-size {c_value} --client-id rogue {self.config_args} > logs/rogue.log 2>&1",
+            shell=True
+        )
+
+        # Start normal clients
+        procs = [rogue_proc]
+        for i in range(1, self.num_clients):
+            proc = clients[i].popen(
+                f"python3 client.py --batch-size 1 --client-id normal_{i+1} {self.config_args} "
+                f"> logs/normal_{i+1}.log 2>&1",
                 shell=True
             )
-
-            # Start normal clients
-            normal_procs = []
-            for i in range(1, self.num_clients):
-                proc = clients[i].popen(
-                    f"python3 client.py --batch-size 1 --client-id normal_{i+1} > logs/normal_{i+1}.log 2>&1",
-                    shell=True
-                )
-                normal_procs.append(proc)
-
-            # Wait for clients
-            rogue_proc.wait()
-            for proc in normal_procs:
-                proc.wait()
-
-            # Stop server
-            server_proc.terminate()
-            server_proc.wait()
-            time.sleep(1)
-
-            # Parse logs & compute JFI
-            results = self.parse_logs(exp_start)   # <<< changed
-            jfi = self.calculate_jfi(results)
-
-            # Write CSV
-            with RESULTS_CSV.open("a", newline="") as f:
-                csv.writer(f).writerow([c_value, run_id, jfi])
-
-            print(f"c={c_value}, run={run_id}, JFI={jfi:.3f}")
-            return jfi
-
+            procs.append(proc)
+        return procs
+
+    def start_loadgen(self, host, c_value):
+        # Every logical client runs inside one process on client1 and writes
+        # logs/rogue.log and logs/normal_<i>.log just like client.py would.
+        return host.popen(
+            f"python3 {LOADGEN} --clients {self.num_clients} --greedy 1 "
+            f"--c {c_value} --log-format part3 {self.config_args} > loadgen.out 2>&1",
+            shell=True
+        )
+
+    def start_stats(self, host, c_value):
+        # Server counters (queue depth, requests, bytes) every stats_interval
+        # seconds while the clients run, one JSON line each.
+        if not self.stats_interval:
+            return None
+        return host.popen(
+            f"python3 {SERVERCTL} stats --watch {self.stats_interval} {self.config_args} "
+            f">> logs/stats_c{c_value}.jsonl",
+            shell=True
+        )
+
+    def run_varying_c(self, sweep=False):
+        runs = [(c, r) for c in range(1, self.c_max + 1) for r in range(1, self.runs_per_c + 1)]
+        try:
+            if sweep:
+                # One network and server for the whole sweep; wait_ready()
+                # RESETs the server before every run.
+                with self.live_network() as net:
+                    for c, r in runs:
+                        self.run_once(net, c, run_id=r)
+            else:
+                for c, r in runs:
+                    self.run_experiment(c, run_id=r)
         finally:
-            net.stop()
-
-    def run_varying_c(self):
-        if not RESULTS_CSV.exists():
-            with RESULTS_CSV.open("w", newline="") as f:
-                csv.writer(f).writerow(["c", "run", "jfi"])
-
-        for c in range(1, self.c_max + 1):
-            for r in range(1, self.runs_per_c + 1):
-                self.run_experiment(c, run_id=r)
+            self.flush()        # also keeps the runs of an interrupted sweep
 
         print("All experiments completed.")
 
 
 def main():
-    runner = Runner(runs_per_c=1)   # run each c 5 times
-    runner.run_varying_c()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['fcfs'], default='fcfs')
+    parser.add_argument('--loadgen', action='store_true',
+                        help='Drive all clients from one asyncio process (tools/loadgen.py)')
+    parser.add_argument('--sweep', action='store_true',
+                        help='Build the network and start the server once for all runs')
+    parser.add_argument('--stats', type=float, default=None, metavar='SECONDS',
+                        help='Log server STATS every SECONDS to logs/stats_c<c>.jsonl')
+    wc_config.add_arguments(parser)
+    args = parser.parse_args()
+
+    runner = Runner(config_file=args.config, runs_per_c=1, loadgen=args.loadgen,
+                    stats_interval=args.stats, overrides=args.set)   # run each c 5 times
+    runner.run_varying_c(sweep=args.sweep)
 
 if __name__ == '__main__':
     main()
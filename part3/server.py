@@ -1,160 +1,257 @@
 #!/usr/bin/env python3
+import os
+import sys
 import socket
-import select
+import selectors
 import collections
+import itertools
 import threading
 import time
 
-
-def load_config(filename="config.json"):
-    cfg = {}
-    with open(filename) as f:
-        for line in f:
-            line = line.strip().strip(",")
-            if not line or line[0] in "{}":
-                continue
-            k, v = line.split(":", 1)
-            cfg[k.strip().strip('"')] = v.strip().strip('"')
-    return cfg
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.corpus import Corpus, EOF_LINE
+from common.netio import send_parts, send_stream
+from common.framing import FrameReader
+from common import protocol
+from common.stats import ServerStats, control_reply
+from common.histogram import LatencyRecorder, dump_at_exit, DEFAULT_FILE
+from common import config as wc_config
+from common.trace import TraceRecorder
 
 
-config = load_config()
+config = wc_config.from_argv()
 SERVER_IP   = config.get("server_ip", "10.0.0.100")
-SERVER_PORT = int(config.get("port", 8887))
+SERVER_PORT = config.get("port", 8887)
 FILENAME    = config.get("filename", "words.txt")
-PROC_MS     = int(config.get("proc_ms", 0))        
-REPEAT      = int(config.get("repeat_words", 1))  
-
-
-with open(FILENAME) as f:
-    base = f.read().strip().split(",")
-words = base * max(1, REPEAT)
+PROC_MS     = config.get("proc_ms", 0)
+REPEAT      = config.get("repeat_words", 1)
+WORKERS     = config.get("workers", 1)
+LATENCY_FILE = config.get("latency_file", DEFAULT_FILE)
+TRACE_FILE  = config.get("trace_file")      # unset: no request trace
 
-def handle_request(req: str) -> str:
 
-    try:
-        p, k = map(int, req.split(","))
-    except Exception:
-        return "EOF\n"
+words = Corpus(FILENAME, repeat=REPEAT)
+latency = LatencyRecorder()
+trace = TraceRecorder() if TRACE_FILE else None
+conn_ids = itertools.count(1)
 
-    if p >= len(words):
-        return "EOF\n"
+def handle_request(req, binary=False):
+    """Reply for one request: a list of buffers, or for STREAM a callable
+    that writes the reply to the socket itself (via sendfile)."""
 
-    slice_words = words[p:p+k]
-    if p + k >= len(words):
-        slice_words.append("EOF")
+    if not binary:
+        try:
+            req = protocol.parse_text(req)
+        except Exception:
+            return [EOF_LINE]
+
+    op, p, k = req
+    if op == protocol.OP_VERSION:
+        return (protocol.version_frame if binary else protocol.version_response)(words)
+    if op == protocol.OP_RESET:
+        # Runners send this between runs of a sweep instead of restarting the
+        # server; the reply doubles as the readiness probe. The run that just
+        # ended leaves its latency histograms in LATENCY_FILE.
+        latency.dump(LATENCY_FILE)
+        if trace:
+            trace.dump(TRACE_FILE)
+        return protocol.reset_frame() if binary else protocol.reset_response()
+    if op not in (protocol.OP_GET, protocol.OP_STREAM, protocol.OP_COUNT) or p >= len(words):
+        return protocol.frame([], True) if binary else [EOF_LINE]
+
+    if op == protocol.OP_STREAM:
+        parts = lambda sock: send_stream(sock, words, p, binary=binary)
+    elif op == protocol.OP_COUNT:
+        parts = (protocol.count_frame if binary else protocol.count_response)(words, p, k)
+    elif binary:
+        parts = protocol.get_frame(words, p, k)
+    else:
+        parts = words.response(p, k)
 
     if PROC_MS > 0:
         time.sleep(PROC_MS / 1000.0)  
 
-    return ",".join(slice_words) + "\n"
+    return parts
+
+
+class Conn:
+    # next_seq numbers requests as they arrive; responses are released in
+    # that order even if several workers finish them out of order.
+    __slots__ = ("sock", "client", "conn_id", "reader", "binary", "next_seq", "send_seq", "pending",
+                 "send_lock")
+
+    def __init__(self, sock, client):
+        self.sock = sock
+        self.client = client        # peer IP, the key for latency histograms
+        self.conn_id = next(conn_ids)   # tells connections apart in traces
+        self.reader = FrameReader(sock, size=4096)
+        self.binary = None          # decided by the first bytes received
+        self.next_seq = 0
+        self.send_seq = 0
+        self.pending = {}
+        self.send_lock = threading.Lock()
+
+    def take_requests(self) -> list:
+        """Every complete request received so far (text lines or binary tuples)."""
+        if self.binary is None:
+            self.binary = protocol.is_binary_hello(self.reader.peek(len(protocol.MAGIC)))
+            if self.binary is None:
+                return []
+            if self.binary:
+                self.reader.skip(len(protocol.MAGIC))
+
+        if self.binary:
+            return list(self.reader.requests())
+        return [line.decode().strip() for line in self.reader.lines() if line.strip()]
+
+    def send_in_order(self, seq: int, resp, arrived=None, dispatched=None):
+        """Send resp once every earlier reply is out; arrived/dispatched are
+        the request's monotonic_ns() stamps (None: not recorded)."""
+        with self.send_lock:
+            self.pending[seq] = (resp, arrived, dispatched)
+            while self.send_seq in self.pending:
+                out, arrived, dispatched = self.pending.pop(self.send_seq)
+                self.send_seq += 1
+                if callable(out):
+                    sent = out(self.sock)
+                else:
+                    sent = send_parts(self.sock, out)
+                stats.served(sent)
+                if arrived is not None:
+                    latency.record(self.client, arrived, dispatched, time.monotonic_ns())
+
+
+rq = collections.deque()
+replies = collections.deque()   # control replies made by the receiver, sent by workers
+rq_lock = threading.Lock()
+rq_cond = threading.Condition(rq_lock)
 
+sel = selectors.DefaultSelector()
+stats = ServerStats()
 
-rq = collections.deque()          
-rq_lock = threading.Lock()
+def server_extra():
+    return {"rq": len(rq), "workers": WORKERS}
 
-inputs = []                       
-inputs_lock = threading.Lock()
+def request_op(req):
+    """The op of a received request; text is only parsed if it is a command."""
+    if isinstance(req, tuple):
+        return req[0]
+    if req[:1].isalpha():
+        try:
+            return protocol.parse_text(req)[0]
+        except ValueError:
+            pass
+    return None
 
-buffers = {}                      
-buffers_lock = threading.Lock()
+def close_conn(conn: Conn):
+    try:
+        sel.unregister(conn.sock)
+        stats.closed()
+    except (KeyError, ValueError):
+        pass
+    try:
+        conn.sock.close()
+    except:
+        pass
 
 def receiver_thread(listener: socket.socket):
 
     listener.setblocking(False)
+    sel.register(listener, selectors.EVENT_READ, None)
 
     while True:
-    
-        with inputs_lock:
-            current_inputs = inputs[:]
-
-        try:
-            readable, _, _ = select.select([listener] + current_inputs, [], [], 0.005)
-        except Exception:
-            continue
-
-        for sock in readable:
-            if sock is listener:
+        for key, _ in sel.select():
+            if key.data is None:
                 try:
-                    conn, _ = listener.accept()
-                    conn.setblocking(False)
-                    with inputs_lock:
-                        inputs.append(conn)
-                    with buffers_lock:
-                        buffers[conn] = ""
+                    sock, addr = listener.accept()
                 except Exception:
                     continue
-            else:
-                try:
-                    data = sock.recv(4096)
-                except Exception:
-                    data = b""
-
-                if not data:
-
-                    with inputs_lock:
-                        if sock in inputs:
-                            inputs.remove(sock)
-                    with buffers_lock:
-                        buffers.pop(sock, None)
-                    try:
-                        sock.close()
-                    except:
-                        pass
-                    continue
+                # Sockets stay blocking so worker sendall() never fails on a
+                # full send buffer; recv only happens once epoll says readable.
+                sock.setblocking(True)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sel.register(sock, selectors.EVENT_READ, Conn(sock, addr[0]))
+                stats.opened()
+                continue
+
+            conn = key.data
+            try:
+                n = conn.reader.fill()
+            except Exception:
+                n = 0
 
+            if not n:
+                close_conn(conn)
+                continue
 
-                with buffers_lock:
-                    buffers[sock] += data.decode()
-                    buf = buffers[sock]
+            try:
+                reqs = conn.take_requests()
+            except ValueError:
+                close_conn(conn)
+                continue
 
-                    while "\n" in buf:
-                        line, buf = buf.split("\n", 1)
-                        line = line.strip()
-                        if line:
-                            with rq_lock:
-                                rq.append((sock, line))
-                    buffers[sock] = buf  
+            if reqs:
+                # PING/STATS are answered here rather than queued behind
+                # everyone else's work, but a worker sends the reply: the
+                # receiver never waits on a connection's send_lock. Workers
+                # take replies before rq, and send_in_order still keeps them
+                # in order with earlier requests on the same connection.
+                arrived = time.monotonic_ns()   # one stamp for everything in this read
+                if trace:
+                    for req in reqs:
+                        trace.record(conn.client, conn.conn_id, req, conn.binary, arrived)
+                with rq_cond:
+                    for req in reqs:
+                        reply = control_reply(stats, request_op(req), conn.binary, server_extra)
+                        if reply is None:
+                            rq.append((conn, conn.next_seq, req, arrived))
+                        else:
+                            replies.append((conn, conn.next_seq, reply))
+                        conn.next_seq += 1
+                    rq_cond.notify(len(reqs))
 
 def worker_thread():
 
     while True:
-        csock, line = None, None
-        with rq_lock:
-            if rq:
-                csock, line = rq.popleft()
-
-        if csock is None:
+        with rq_cond:
+            while not rq and not replies:
+                rq_cond.wait()
+            if replies:
+                conn, seq, resp = replies.popleft()
+                req = arrived = None
+            else:
+                conn, seq, req, arrived = rq.popleft()
+                resp = None
+        dispatched = time.monotonic_ns()
 
-            time.sleep(0.0005)
-            continue
+        if req is not None and request_op(req) == protocol.OP_RESET:
+            arrived = None      # the runner's RESET is not part of either run
 
         try:
-            resp = handle_request(line)
-            csock.sendall(resp.encode())
+            if resp is None:
+                resp = handle_request(req, conn.binary)
+            conn.send_in_order(seq, resp, arrived, dispatched)
         except Exception:
-
-            with inputs_lock:
-                if csock in inputs:
-                    inputs.remove(csock)
-            with buffers_lock:
-                buffers.pop(csock, None)
+            # Let the receiver see EOF and unregister the socket itself.
             try:
-                csock.close()
+                conn.sock.shutdown(socket.SHUT_RDWR)
             except:
                 pass
 
 def main():
+    dump_at_exit(latency, LATENCY_FILE)
+    if trace:
+        dump_at_exit(trace, TRACE_FILE)
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as ls:
         ls.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         ls.bind((SERVER_IP, SERVER_PORT))
         ls.listen()
-        print(f"Server listening on {SERVER_IP}:{SERVER_PORT} (threaded FCFS)")
+        print(f"Server listening on {SERVER_IP}:{SERVER_PORT} (threaded FCFS, selectors, {WORKERS} workers)")
 
         t_recv = threading.Thread(target=receiver_thread, args=(ls,), daemon=True)
-        t_work = threading.Thread(target=worker_thread, daemon=True)
         t_recv.start()
-        t_work.start()
+        for _ in range(max(1, WORKERS)):
+            threading.Thread(target=worker_thread, daemon=True).start()
 
         try:
             while True:
@@ -1,102 +1,193 @@
 import socket
+import sys
+from collections import Counter
 import time
 import argparse
-import json
 import os
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import protocol
+from common.framing import FrameReader
+from common.autotune import KTuner
+from common.rangecache import RangeCache, DEFAULT_DIR
+from common import config as wc_config
 
-with open('config.json', 'r') as f:
-    config = json.load(f)
+
+config = wc_config.from_argv()
 
 SERVER_IP = config['server_ip']
 PORT = config['port']
 K = config['k']
+BINARY = config.get('protocol', 'text') == 'binary'
+
+POOLED = True
+BIND_IP = None      # source address (--bind-ip); the server tells clients apart by IP
+
+def connect():
+    src = (BIND_IP, 0) if BIND_IP else None
+    return socket.create_connection((SERVER_IP, PORT), source_address=src)
+
+def open_connection():
+    """Connect to the server; returns (socket, buffered reader)."""
+    s = connect()
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if BINARY:
+        s.sendall(protocol.MAGIC)
+    return s, FrameReader(s)
+
+def close_connections(connections):
+    for s, _ in connections:
+        s.close()
+
+def recv_text(reader):
+    """Read one text reply; returns (payload, eof), payload without "EOF"."""
+    line = reader.readline()
+    if not line.endswith(b"\n"):
+        raise ConnectionError("server closed the connection before EOF")
+    response = line.strip()
+    if response == b"EOF":
+        return b"", True
+    if response.endswith(b",EOF"):
+        return response[:-4], True
+    return response, not response
+
+def recv_binary(reader):
+    """Read one length-prefixed reply; never truncated, whatever k is."""
+    frame = reader.read_frame()
+    if frame is None:
+        raise ConnectionError("server closed the connection before EOF")
+    flags, payload = frame
+    return payload, bool(flags & protocol.FLAG_EOF)
+
+def count_words(word_count, payload):
+    # Count straight from the reply bytes; no word list is kept, so memory is
+    # O(vocabulary) whatever the file size.
+    if payload:
+        word_count.update(w for w in payload.split(b',') if w)
+
+def stream_words(word_count):
+    """Fetch everything with one STREAM request over a single connection."""
+    with connect() as s:
+        if BINARY:
+            s.sendall(protocol.MAGIC + protocol.encode_request(0, 0, protocol.OP_STREAM))
+            reader = FrameReader(s)
+            while True:
+                frame = reader.read_frame()
+                if frame is None:
+                    raise ConnectionError("server closed the connection before EOF")
+                flags, payload = frame
+                count_words(word_count, payload)
+                if flags & protocol.FLAG_EOF:
+                    return
 
-def download_file(batch_size, client_id):
-    words = []
+        s.sendall(b"STREAM 0\n")
+        tail = b""
+        while True:
+            chunk = s.recv(65536)
+            if not chunk:
+                raise ConnectionError("server closed the connection before EOF")
+            *done, tail = (tail + chunk).split(b',')
+            word_count.update(done)
+            if tail.endswith(b"\n"):
+                return
+
+def download_file(batch_size, client_id, stream=False, count=False, tuner=None, cache=None):
+    word_count = Counter()
     offset = 0
     start_time = time.time()
     
 
     os.makedirs("logs", exist_ok=True)
     
-    while True:
-        connections = []
-        responses = []
+    cached = False
+    if count:
+        with connect() as s:
+            word_count.update(protocol.fetch_counts(s, 0, BINARY))
+    elif stream:
+        stream_words(word_count)
+    elif cache:
+        # Count what the cache already holds, then fetch only the remainder.
+        offset, cached = cache.replay(0, lambda payload: count_words(word_count, payload))
+
+    # Pooled mode opens batch_size long-lived connections once and sends one
+    # request on each per round; the server still queues every request
+    # individually per client, so only the handshakes go away.
+    pool = []
+    while not stream and not count and not cached:
+        connections = pool
         
 
-        for i in range(batch_size):
+        while len(connections) < batch_size:
             try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.connect((SERVER_IP, PORT))
-                connections.append(s)
+                connections.append(open_connection())
             except Exception as e:
                 print(f"Connection error: {e}")
-                for conn in connections:
-                    conn.close()
+                close_connections(connections)
                 return None
         
 
-        for i, conn in enumerate(connections):
-            request = f"{offset + i * K},{K}\n"
+        # With a tuner the round's chunk size comes from it instead of config k.
+        k = tuner.k if tuner else K
+        sent_at = time.monotonic()
+        for i, (conn, _) in enumerate(connections):
+            if BINARY:
+                request = protocol.encode_request(offset + i * k, k)
+            else:
+                request = f"{offset + i * k},{k}\n".encode()
             try:
-                conn.send(request.encode())
+                conn.sendall(request)
             except Exception as e:
                 print(f"Send error: {e}")
-                for c in connections:
-                    c.close()
+                close_connections(connections)
                 return None
         
 
         eof_received = False
-        for i, conn in enumerate(connections):
+        for i, (conn, reader) in enumerate(connections):
             try:
-                response = conn.recv(1024).decode().strip()
-                responses.append(response)
-                
-                if response == "EOF" or "EOF" in response.split(','):
-                    eof_received = True
+                payload, eof = recv_binary(reader) if BINARY else recv_text(reader)
+                # Responses after the first EOF carry no words.
+                if not eof_received:
+                    count_words(word_count, payload)
+                    if cache:
+                        cache.put(offset + i * k, payload, eof)
+                    if tuner:
+                        tuner.observe(k, time.monotonic() - sent_at)
+                eof_received = eof_received or eof
             except Exception as e:
+                # A lost reply would leave a hole in the counts; give up
+                # without logging a completion time, as on send errors.
                 print(f"Receive error: {e}")
-                responses.append("")
-            finally:
-                conn.close()
-        
+                close_connections(connections)
+                return None
 
-        for response in responses:
-            if response == "EOF":
-                continue
-                
-            parts = response.split(',')
-            for word in parts:
-                if word == "EOF":
-                    eof_received = True
-                    break
-                words.append(word)
-            
-            if eof_received:
-                break
+        if not POOLED or eof_received:
+            close_connections(connections)
+            pool = []
         
         if eof_received:
             break
             
-        offset += batch_size * K
+        offset += batch_size * k
     
     end_time = time.time()
     completion_time = end_time - start_time
     
 
-    word_count = {}
-    for word in words:
-        word_count[word] = word_count.get(word, 0) + 1
-    
-
     for word, count in word_count.items():
+        if isinstance(word, bytes):
+            word = word.decode()
         print(f"{word}, {count}")
     
 
     with open(f"logs/{client_id}.log", "w") as f:
         f.write(f"{completion_time}")
+
+    if tuner:
+        # Kept out of the .log file, which must hold only the completion time.
+        with open(f"logs/{client_id}.ktrace", "w") as f:
+            for t, k, tput in tuner.history:
+                f.write(f"{t:.6f} {k} {tput:.1f}\n")
     
     return completion_time
 
@@ -104,6 +195,34 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--batch-size", type=int, default=1, help="Number of parallel requests")
     parser.add_argument("--client-id", type=str, default="client", help="Client identifier")
+    parser.add_argument("--protocol", choices=["text", "binary"], default=None,
+                        help="Wire format (default: config 'protocol' or text)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Fetch the whole file with one server-push STREAM request")
+    parser.add_argument("--count", action="store_true",
+                        help="Ask the server for word counts (COUNT) instead of the words")
+    parser.add_argument("--auto-k", action="store_true",
+                        help="Tune the chunk size k while downloading, starting at config k")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_DIR, default=None, metavar="DIR",
+                        help="Keep fetched ranges on disk keyed by the corpus VERSION "
+                             f"and only download what is missing (default dir: {DEFAULT_DIR})")
+    parser.add_argument("--fresh-connections", action="store_true",
+                        help="Open batch_size new connections every round instead of a pool")
+    parser.add_argument("--bind-ip", default=None, help="Local address to connect from")
+    wc_config.add_arguments(parser)
     args = parser.parse_args()
+    BIND_IP = args.bind_ip
+    if args.protocol:
+        BINARY = args.protocol == "binary"
+    POOLED = not args.fresh_connections
     
-    download_file(args.batch_size, args.client_id)
\ No newline at end of file
+    tuner = KTuner(k=K, samples=args.batch_size) if args.auto_k else None
+    cache = None
+    if args.cache and not (args.stream or args.count):
+        with connect() as s:
+            cache = RangeCache(args.cache, protocol.fetch_version(s, BINARY))
+    try:
+        download_file(args.batch_size, args.client_id, args.stream, args.count, tuner, cache)
+    finally:
+        if cache:
+            cache.close()
\ No newline at end of file
@@ -2,16 +2,30 @@
 
 import json
 import os
-import time
+import sys
 import glob
-import numpy as np
+import ipaddress
 import argparse
-import matplotlib.pyplot as plt
+from contextlib import contextmanager, nullcontext
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.results import ResultStore, jfi as fairness
+from common import config as wc_config
+
+C_VALUES = list(range(1, 50, 4))
+
+LOADGEN = '../tools/loadgen.py'
+SERVERCTL = '../tools/serverctl.py'
+LATENCY_FILE = 'logs/latency.json'     # server config 'latency_file'
+# The server tells clients apart by source IP, so each logical client of the
+# load generator gets its own alias on client1 (Mininet hosts sit in 10/8).
+LOADGEN_BASE_IP = '10.1.0.1'
 
 class Runner:
-    def __init__(self, config_file='config.json'):
-        with open(config_file, 'r') as f:
-            self.config = json.load(f)
+    def __init__(self, config_file='config.json', loadgen=False, stats_interval=None, overrides=()):
+        self.config = wc_config.load(config_file, overrides)
+        # Passed to every server/client/tool launch instead of editing the file
+        self.config_args = wc_config.set_args(wc_config.parse_sets(overrides), config_file)
         
         self.server_ip = self.config['server_ip']
         self.port = self.config['port']
@@ -20,6 +34,12 @@ class Runner:
         self.p = self.config['p']
         self.k = self.config['k']
         self.num_repetitions = self.config.get('num_repetitions', 2)
+        self.trace_file = self.config.get('trace_file')
+        self.loadgen = loadgen
+        self.stats_interval = stats_interval
+        self.store = ResultStore()
+        self.results_csv = 'results.csv'
+        self.csv_rows = []          # average JFI per c, written by saving()
         
         print(f"Config: {self.num_clients} clients, c={self.c}, p={self.p}, k={self.k}")
     
@@ -31,18 +51,17 @@ class Runner:
         print("Cleaned old logs")
     
     def parse_logs(self):
-        """Parse log files and return completion times"""
-        completion_times = {'rogue': [], 'normal': []}
+        """Parse log files and return completion times (and client names)"""
+        completion_times = {'rogue': [], 'normal': [], 'names': {'rogue': [], 'normal': []}}
         
         log_files = glob.glob("logs/*.log")
         for log_file in log_files:
             with open(log_file, 'r') as f:
                 try:
                     time_val = float(f.read().strip())
-                    if 'rogue' in log_file:
-                        completion_times['rogue'].append(time_val)
-                    else:
-                        completion_times['normal'].append(time_val)
+                    role = 'rogue' if 'rogue' in log_file else 'normal'
+                    completion_times[role].append(time_val)
+                    completion_times['names'][role].append(os.path.basename(log_file)[:-4])
                 except ValueError:
                     print(f"Invalid content in {log_file}")
         
@@ -50,102 +69,184 @@ class Runner:
     
     def calculate_jfi(self, completion_times):
         """Calculate Jain's Fairness Index"""
-        # Convert completion times to throughput (benefit metric)
-        throughputs = [1/t for t in completion_times]
-        
-        n = len(throughputs)
-        if n == 0:
-            return 0
-            
-        sum_throughput = sum(throughputs)
-        sum_squared_throughput = sum(t**2 for t in throughputs)
-        
-        jfi = (sum_throughput ** 2) / (n * sum_squared_throughput)
-        return jfi
+        # Throughput 1/t is the benefit metric (common/results.py)
+        return fairness(completion_times)
+    
+    @contextmanager
+    def live_network(self):
+        """Mininet network with the server running; both stop on exit"""
+        from topology import create_network
+        net = create_network(num_clients=1 if self.loadgen else self.num_clients)
+        server_proc = None
+        try:
+            print("Starting server...")
+            server_proc = net.get('server').popen(f"python3 server.py {self.config_args}", shell=True)
+            yield net
+        finally:
+            if server_proc is not None:
+                server_proc.terminate()
+                server_proc.wait()
+            net.stop()
+    
+    def wait_ready(self, host):
+        """RESET the server from host, retrying until it answers"""
+        out = host.cmd(f"python3 {SERVERCTL} {self.config_args}")
+        if "READY_MS" not in out:
+            raise RuntimeError(f"Server did not become ready: {out.strip()}")
     
     def run_experiment(self, c_value):
-        """Run single experiment with given c value"""
+        """Run single experiment with given c value on its own network"""
+        with self.live_network() as net:
+            return self.run_once(net, c_value)
+    
+    def run_once(self, net, c_value):
+        """Run one experiment on a live network and server"""
         print(f"Running experiment with c={c_value}")
         
         # Clean logs
         self.cleanup_logs()
         
-        # Create network
-        from topology import create_network
-        net = create_network(num_clients=self.num_clients)
+        # Get hosts
+        clients = [net.get(f'client{i+1}') for i in range(len(net.hosts) - 1)]
+        self.wait_ready(clients[0])
         
-        try:
-            # Get hosts
-            server = net.get('server')
-            clients = [net.get(f'client{i+1}') for i in range(self.num_clients)]
-            
-            # Start server
-            print("Starting server...")
-            server_proc = server.popen("python3 server.py")
-            time.sleep(3)
-            
-            # Start clients
-            print("Starting clients...")
-            # Client 1 is rogue (batch size c)
-            rogue_proc = clients[0].popen(f"python3 client.py --batch-size {c_value} --client-id rogue")
-            
-            # Clients 2-N are normal (batch size 1)
-            normal_procs = []
-            for i in range(1, self.num_clients):
-                proc = clients[i].popen(f"python3 client.py --batch-size 1 --client-id normal_{i+1}")
-                normal_procs.append(proc)
-            
-            # Wait for all clients
-            rogue_proc.wait()
-            for proc in normal_procs:
-                proc.wait()
-            
-            # Stop server
-            server_proc.terminate()
-            server_proc.wait()
-            time.sleep(2)
-            
-            # Parse results
-            time.sleep(1)
-            results = self.parse_logs()
-            
-            return results
-            
-        finally:
-            net.stop()
+        # Start clients
+        print("Starting clients...")
+        watcher = self.start_stats(clients[0], c_value)
+        if self.loadgen:
+            procs = [self.start_loadgen(clients[0], c_value)]
+        else:
+            procs = self.start_clients(clients, c_value)
+        
+        # Wait for all clients; each writes its log before exiting
+        for proc in procs:
+            proc.wait()
+        if watcher:
+            watcher.terminate()
+            watcher.wait()
+        rep = len(glob.glob(f"logs/latency_c{c_value}_rep*.json")) + 1
+        latency = self.save_latency(clients[0], f"logs/latency_c{c_value}_rep{rep}.json")
+        self.save_trace(f"logs/trace_c{c_value}_rep{rep}.bin")
+        
+        # Parse results
+        results = self.parse_logs()
+        results['latency'] = latency
+        return results
+    
+    def record(self, c_value, rep, results, jfi):
+        """Keep one repetition in the results store"""
+        names = results['names']['rogue'] + results['names']['normal']
+        times = results['rogue'] + results['normal']
+        self.store.add('runs', part='part4', x=c_value, run=rep, metric='jfi', value=jfi)
+        self.store.add('clients', part='part4', x=c_value, run=rep, client=names,
+                       rogue=[n == 'rogue' for n in names],
+                       completion_ms=[t * 1000 for t in times])
+        if results.get('latency'):
+            self.store.add_latency('part4', c_value, rep, results['latency'])
+    
+    def save_latency(self, host, path):
+        """RESET the server so it writes this run's latency histograms, keep them"""
+        self.wait_ready(host)
+        if not os.path.exists(LATENCY_FILE):
+            return None
+        os.replace(LATENCY_FILE, path)
+        with open(path) as f:
+            snap = json.load(f)
+        lat = snap['all']
+        print(f"Queue p99: {lat['queue']['p99_us']}us, service p99: {lat['service']['p99_us']}us")
+        return snap
+    
+    def save_trace(self, path):
+        """Keep the request trace the same RESET wrote (for tools/replay.py)"""
+        if self.trace_file and os.path.exists(self.trace_file):
+            os.replace(self.trace_file, path)
     
-    def run_varying_c(self):
-        """Run experiments with c from 1 to 10"""
-        c_values = list(range(1, 50,4))
+    def start_clients(self, clients, c_value):
+        """One client.py per Mininet host"""
+        # Client 1 is rogue (batch size c)
+        procs = [clients[0].popen(f"python3 client.py --batch-size {c_value} --client-id rogue {self.config_args}",
+                                    shell=True)]
+        
+        # Clients 2-N are normal (batch size 1)
+        for i in range(1, self.num_clients):
+            procs.append(clients[i].popen(
+                f"python3 client.py --batch-size 1 --client-id normal_{i+1} {self.config_args}", shell=True))
+        return procs
+    
+    def start_loadgen(self, host, c_value):
+        """All clients as one asyncio process on host, one source IP each"""
+        base = ipaddress.ip_address(LOADGEN_BASE_IP)
+        intf = host.defaultIntf()
+        with open('loadgen_ips.batch', 'w') as f:
+            for i in range(self.num_clients):
+                f.write(f"addr add {base + i}/8 dev {intf}\n")
+        host.cmd('ip -force -batch loadgen_ips.batch')
+        
+        return host.popen(
+            f"python3 {LOADGEN} --clients {self.num_clients} --greedy 1 --c {c_value} "
+            f"--bind-base {LOADGEN_BASE_IP} --log-format part4 {self.config_args} > loadgen.out 2>&1",
+            shell=True
+        )
+    
+    def start_stats(self, host, c_value):
+        """Poll server STATS (per-client DRR queues) while the clients run"""
+        if not self.stats_interval:
+            return None
+        return host.popen(
+            f"python3 {SERVERCTL} stats --watch {self.stats_interval} {self.config_args} "
+            f">> logs/stats_c{c_value}.jsonl",
+            shell=True
+        )
+    
+    def run_varying_c(self, sweep=False):
+        """Run experiments over C_VALUES; with sweep, on one network and server"""
+        c_values = C_VALUES
         jfi_results = []
         
         print("Running experiments with varying c values...")
         
-        for c in c_values:
-            jfi_sum = 0
-            for rep in range(self.num_repetitions):
-                print(f"\n--- Testing c = {c}, repetition {rep+1}/{self.num_repetitions} ---")
-                results = self.run_experiment(c)
+        # With sweep the network and server stay up across runs and
+        # wait_ready() RESETs the server before each one. The results store
+        # and results.csv are written once at the end, or when the sweep is
+        # interrupted.
+        with self.live_network() if sweep else nullcontext() as net, self.saving():
+            for c in c_values:
+                jfi_sum = 0
+                for rep in range(self.num_repetitions):
+                    print(f"\n--- Testing c = {c}, repetition {rep+1}/{self.num_repetitions} ---")
+                    results = self.run_once(net, c) if net else self.run_experiment(c)
+                    
+                    # Combine all completion times
+                    all_times = results['rogue'] + results['normal']
+                    jfi = self.calculate_jfi(all_times)
+                    jfi_sum += jfi
+                    self.record(c, rep + 1, results, jfi)
+                    
+                    print(f"JFI for c={c}, rep{rep+1}: {jfi:.4f}")
                 
-                # Combine all completion times
-                all_times = results['rogue'] + results['normal']
-                jfi = self.calculate_jfi(all_times)
-                jfi_sum += jfi
+                avg_jfi = jfi_sum / self.num_repetitions
+                jfi_results.append(avg_jfi)
+                print(f"Average JFI for c={c}: {avg_jfi:.4f}")
                 
-                print(f"JFI for c={c}, rep{rep+1}: {jfi:.4f}")
-            
-            avg_jfi = jfi_sum / self.num_repetitions
-            jfi_results.append(avg_jfi)
-            print(f"Average JFI for c={c}: {avg_jfi:.4f}")
-            
-            # Save results to CSV
-            with open('results.csv', 'a') as f:
-                f.write(f"{c},{avg_jfi:.4f}\n")
+                self.csv_rows.append(f"{c},{avg_jfi:.4f}\n")
         
         return c_values, jfi_results
     
+    @contextmanager
+    def saving(self):
+        """Write the results store and results.csv once, at the end of a
+        sweep or when it is interrupted"""
+        try:
+            yield
+        finally:
+            self.store.save()
+            with open(self.results_csv, 'a') as f:
+                f.writelines(self.csv_rows)
+            self.csv_rows = []
+    
     def plot_jfi_vs_c(self, c_values, jfi_values):
         """Plot JFI values vs c values"""
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(8, 6))
         plt.plot(c_values, jfi_values, 'o-', linewidth=2, markersize=8)
         plt.xlabel('Number of parallel requests (c)')
@@ -159,9 +260,17 @@ class Runner:
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--single', action='store_true', help='Run single experiment with config c value')
+    parser.add_argument('--loadgen', action='store_true',
+                        help='Drive all clients from one asyncio process (tools/loadgen.py)')
+    parser.add_argument('--sweep', action='store_true',
+                        help='Build the network and start the server once for all runs')
+    parser.add_argument('--stats', type=float, default=None, metavar='SECONDS',
+                        help='Log server STATS every SECONDS to logs/stats_c<c>.jsonl')
+    wc_config.add_arguments(parser)
     args = parser.parse_args()
     
-    runner = Runner()
+    runner = Runner(config_file=args.config, loadgen=args.loadgen, stats_interval=args.stats,
+                    overrides=args.set)
     
     if args.single:
         # Run single experiment with config c value
@@ -174,7 +283,7 @@ def main():
         if os.path.exists('results.csv'):
             os.remove('results.csv')
             
-        c_values, jfi_results = runner.run_varying_c()
+        c_values, jfi_results = runner.run_varying_c(sweep=args.sweep)
         runner.plot_jfi_vs_c(c_values, jfi_results)
 
 if __name__ == '__main__':
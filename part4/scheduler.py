@@ -0,0 +1,76 @@
+from collections import deque
+
+
+class DRRScheduler:
+    """Deficit Round Robin over per-client FIFO queues.
+
+    Only clients with queued work sit in the active ring, so picking the next
+    request never scans idle clients. Each request carries a cost (words it
+    will return); a client may only send while its deficit covers that cost,
+    which keeps large-k clients from taking more bytes per turn than others.
+    A request costing more than the credit a client has on reaching the head
+    of the ring (e.g. a large --auto-k GET or a STREAM chunk) would take
+    cost / quantum trips around the ring to afford; instead the client is
+    granted those rounds of credit at once and served one such request that
+    turn. The quantum itself stays fixed, so clients sending ordinary
+    requests keep the same number per turn, and enqueue and pop are O(1).
+    """
+
+    def __init__(self, quantum=1):
+        self.quantum = max(1, quantum)
+        self.queues = {}            # client_id -> deque of (cost, item)
+        self.deficit = {}           # client_id -> unspent credit
+        self.ring = deque()         # active client ids, head is being served
+        self.credited = False       # head already received its quantum this turn
+
+    def __len__(self):
+        return len(self.ring)
+
+    def enqueue(self, client_id, item, cost=1):
+        q = self.queues.get(client_id)
+        if q is None:
+            q = self.queues[client_id] = deque()
+            self.deficit[client_id] = 0
+            self.ring.append(client_id)
+        q.append((cost, item))
+
+    def push_front(self, client_id, item, cost=1):
+        """Queue item ahead of the client's other requests (used to continue a
+        partially served request without reordering its connection)."""
+        q = self.queues.get(client_id)
+        if q is None:
+            self.enqueue(client_id, item, cost)
+        else:
+            q.appendleft((cost, item))
+
+    def pop(self):
+        """Return (client_id, item) for the next request, or None if idle."""
+        ring = self.ring
+        while ring:
+            client_id = ring[0]
+            q = self.queues[client_id]
+            cost, item = q[0]
+            if not self.credited:
+                deficit = self.deficit[client_id] + self.quantum
+                if cost > deficit:
+                    deficit += -(-(cost - deficit) // self.quantum) * self.quantum
+                self.deficit[client_id] = deficit
+                self.credited = True
+
+            if cost <= self.deficit[client_id]:
+                q.popleft()
+                self.deficit[client_id] -= cost
+                if not q:
+                    # Idle clients leave the ring and forfeit leftover credit.
+                    ring.popleft()
+                    del self.queues[client_id]
+                    del self.deficit[client_id]
+                    self.credited = False
+                return client_id, item
+
+            ring.rotate(-1)
+            self.credited = False
+        return None
+
+    def queue_lengths(self):
+        return {client_id: len(q) for client_id, q in self.queues.items()}
@@ -1,131 +1,333 @@
+import os
+import sys
 import socket
+import itertools
+import selectors
 import threading
-import json
-from collections import deque, defaultdict
+import time
+from scheduler import DRRScheduler
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.corpus import Corpus
+from common.netio import send_parts, send_stream
+from common.framing import FrameReader
+from common import protocol
+from common.stats import ServerStats, CONTROL_OPS, control_reply
+from common.histogram import LatencyRecorder, dump_at_exit, DEFAULT_FILE
+from common import config as wc_config
+from common.trace import TraceRecorder
 
-with open('config.json', 'r') as f:
-    config = json.load(f)
+
+config = wc_config.from_argv()
 
 HOST = config['server_ip']
 PORT = config['port']
+# Credit added per round-robin turn, in words. A request costing more is
+# granted the rounds it needs in one step (see DRRScheduler).
+QUANTUM = config.get('drr_quantum', config['k'])
+LATENCY_FILE = config.get('latency_file', DEFAULT_FILE)
+TRACE_FILE = config.get('trace_file')       # unset: no request trace
+STREAM_CHUNK = 64 * 1024    # bytes of a STREAM sent per DRR turn
 
 
-with open('words.txt', 'r') as f:
-    words = f.read().strip().split(',')
+words = Corpus('words.txt')
 
 
-client_queues = defaultdict(deque)
-active_clients = set()
+client_queues = DRRScheduler(quantum=QUANTUM)
 queue_lock = threading.Lock()
 condition = threading.Condition(queue_lock)
+stats = ServerStats()
+latency = LatencyRecorder()     # keyed by client IP, like the DRR queues
+trace = TraceRecorder() if TRACE_FILE else None
+conn_ids = itertools.count(1)
 
-def handle_client(conn, addr):
-    print(f"Connected by {addr}")
-    client_id = addr[0]  
-    
-    try:
-        data = conn.recv(1024).decode().strip()
-        if not data:
+def server_extra():
+    """DRR state for STATS: queued requests per client IP."""
+    with condition:
+        return {"queues": client_queues.queue_lengths(), "active_clients": len(client_queues)}
+
+class Stream:
+    """A STREAM request in progress: the next chunk to push and the wire format.
+
+    The worker sends one chunk of about STREAM_CHUNK bytes per turn, charged
+    its word count like a GET, and puts the rest back at the front of the
+    client's queue, so a streaming client is scheduled like any other DRR
+    client and later requests on its connection still wait for the stream
+    to finish. The corpus file stays open between turns.
+    """
+    __slots__ = ('p', 'end', 'binary', 'dispatched', 'file')
+
+    def __init__(self, p, binary):
+        self.p = p
+        self.end = words.chunk_end(p, STREAM_CHUNK)
+        self.binary = binary
+        self.dispatched = None      # monotonic_ns() of the first chunk
+        self.file = None            # corpus file, open from the first chunk to the last
+
+    def cost(self):
+        return max(1, self.end - self.p)
+
+class Conn:
+    """Server side of one client connection.
+
+    A connection may carry many requests. `pending` counts requests that are
+    queued or being served; the socket is closed only once the peer has hung
+    up and every reply owed to it is out, so a reused fd can never receive
+    another connection's data. Both fields are guarded by queue_lock.
+    """
+    __slots__ = ('sock', 'client_id', 'conn_id', 'reader', 'binary', 'pending', 'eof')
+
+    def __init__(self, sock, client_id):
+        self.sock = sock
+        self.client_id = client_id
+        self.conn_id = next(conn_ids)   # tells connections apart in traces
+        self.reader = FrameReader(sock, size=4096)
+        self.binary = None          # decided by the first bytes received
+        self.pending = 0
+        self.eof = False
+
+    def take_requests(self):
+        """Every complete request received so far."""
+        if self.binary is None:
+            self.binary = protocol.is_binary_hello(self.reader.peek(len(protocol.MAGIC)))
+            if self.binary is None:
+                return []
+            if self.binary:
+                self.reader.skip(len(protocol.MAGIC))
+
+        if self.binary:
+            reqs = list(self.reader.requests())
+        else:
+            reqs = [parse_line(line.decode().strip()) for line in self.reader.lines() if line.strip()]
+
+        return [Stream(r[1], self.binary) if isinstance(r, tuple) and r[0] == protocol.OP_STREAM else r
+                for r in reqs]
+
+def parse_line(data):
+    # Commands become (op, p, k) like binary requests. Plain "p,k" lines and
+    # anything unparseable stay a str; the worker parses those and sends the
+    # usual error replies.
+    if data[:1].isalpha():
+        try:
+            return protocol.parse_text(data)
+        except ValueError:
+            pass
+    return data
+
+sel = selectors.DefaultSelector()
+
+def hang_up(conn):
+    """Peer closed (or broke) the connection: stop reading from it."""
+    sel.unregister(conn.sock)
+    stats.closed()
+    with condition:
+        conn.eof = True
+        if conn.pending:
             return
-        
+    conn.sock.close()
+
+def finish(conn):
+    """A request on conn has been fully answered."""
+    with condition:
+        conn.pending -= 1
+        done = conn.eof and not conn.pending
+    if done:
+        conn.sock.close()
+
+def handle_client(conn):
+    """Read from a ready connection and enqueue every complete request."""
+    try:
+        got = conn.reader.fill()
+    except OSError:
+        got = 0
 
+    if not got and conn.binary is False and conn.reader.peek(len(conn.reader)).strip():
+        conn.reader.feed(b"\n")     # last text request may lack a newline
+
+    reqs = conn.take_requests()
+    arrived = time.monotonic_ns()   # one stamp for everything in this read
+    if trace:
+        for data in reqs:
+            req = (protocol.OP_STREAM, data.p, 0) if isinstance(data, Stream) else data
+            trace.record(conn.client_id, conn.conn_id, req, conn.binary, arrived)
+
+    # PING/STATS skip the DRR queues when nothing else on this connection is
+    # owed a reply; otherwise they wait their turn to keep replies in order.
+    # This thread serves every connection, so it never blocks on a send: if
+    # the peer is not reading, the rest of the reply goes to the worker (as
+    # bytes) ahead of the connection's later requests.
+    with condition:
+        idle = not conn.pending
+    while idle and reqs and isinstance(reqs[0], tuple) and reqs[0][0] in CONTROL_OPS:
+        op = reqs.pop(0)[0]
+        reply = b"".join(control_reply(stats, op, conn.binary, server_extra))
+        try:
+            sent = conn.sock.send(reply, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            sent = 0
+        if sent < len(reply):
+            stats.served(sent, requests=0)
+            reqs.insert(0, reply[sent:])
+            break
+        stats.served(sent)
+
+    if reqs:
         with condition:
-            client_queues[client_id].append((conn, data))
-            active_clients.add(client_id)
+            for data in reqs:
+                conn.pending += 1
+                client_queues.enqueue(conn.client_id, (conn, data, arrived), request_cost(data))
             condition.notify()
-            
-    except Exception as e:
-        print(f"Error handling client {addr}: {e}")
-    finally:
-        pass
+
+    if not got:
+        hang_up(conn)
+
+def reader_loop(listener):
+    """Single I/O thread: accepts connections and reads requests for all."""
+    listener.setblocking(False)
+    sel.register(listener, selectors.EVENT_READ)
+
+    while True:
+        for key, _ in sel.select():
+            if key.fileobj is listener:
+                try:
+                    sock, addr = listener.accept()
+                except OSError:
+                    continue
+                sock.setblocking(True)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sel.register(sock, selectors.EVENT_READ, Conn(sock, addr[0]))
+                stats.opened()
+                continue
+
+            try:
+                handle_client(key.data)
+            except Exception as e:
+                print(f"Error handling client: {e}")
+                try:
+                    hang_up(key.data)
+                except (KeyError, ValueError, OSError):
+                    pass
+
+def request_cost(data):
+    """Words a request will return; malformed requests cost one unit."""
+    if isinstance(data, Stream):
+        return data.cost()
+    if isinstance(data, bytes):
+        return 1
+    if isinstance(data, tuple):
+        op, p, k = data
+        if op != protocol.OP_GET:
+            return 1
+    else:
+        try:
+            p, k = map(int, data.split(','))
+        except ValueError:
+            return 1
+    return max(1, min(k, len(words) - p))
 
 def process_requests():
 
-    current_client_idx = 0
-    client_list = []
-    
     while True:
         with condition:
-
-            while not active_clients:
+            while not client_queues:
                 condition.wait()
-            
+            client_id, (conn, data, arrived) = client_queues.pop()
+        dispatched = time.monotonic_ns()
 
-            if set(client_list) != active_clients:
-                client_list = list(active_clients)
-                
+        sock, binary = conn.sock, conn.binary
+        done = True
+        try:
 
-            if not client_list:
+            if isinstance(data, Stream):
+                first = data.file is None
+                if first:
+                    data.dispatched = dispatched
+                    data.file = open(words.filename, "rb")
+                sent = send_stream(sock, words, data.p, data.end, data.binary, data.file, first)
+                more = data.end < len(words)
+                stats.served(sent, requests=0 if more else 1)
+                if more:
+                    done = False
+                    data.p = data.end
+                    data.end = words.chunk_end(data.p, STREAM_CHUNK)
+                    with condition:
+                        client_queues.push_front(client_id, (conn, data, arrived), data.cost())
+                else:
+                    latency.record(client_id, arrived, data.dispatched, time.monotonic_ns())
                 continue
-                
-
-            attempts = 0
-            while attempts < len(client_list):
-                current_client_idx = (current_client_idx) % len(client_list)
-                client_id = client_list[current_client_idx]
-                
-                if client_queues[client_id]:
-
-                    conn, data = client_queues[client_id].popleft()
-                    
 
-                    if not client_queues[client_id]:
-                        active_clients.remove(client_id)
-                        
+            if isinstance(data, bytes):
+                # Rest of a control reply the reader could not send at once
+                stats.served(send_parts(sock, [data]))
+                continue
 
-                    current_client_idx = (current_client_idx + 1) % len(client_list)
-                    break
+            if isinstance(data, tuple):
+                op, p, k = data
+                if op == protocol.OP_COUNT:
+                    reply = protocol.count_frame if binary else protocol.count_response
+                    parts = reply(words, p, k)
+                elif op == protocol.OP_VERSION:
+                    reply = protocol.version_frame if binary else protocol.version_response
+                    parts = reply(words)
+                elif op == protocol.OP_RESET:
+                    # Between runs of a sweep; clients that finished left the
+                    # DRR ring already, so only the latency histograms and
+                    # request trace of the run that just ended need saving
+                    # and clearing.
+                    latency.dump(LATENCY_FILE)
+                    if trace:
+                        trace.dump(TRACE_FILE)
+                    stats.served(send_parts(sock, protocol.reset_frame() if binary else protocol.reset_response()))
+                    continue
+                elif op in CONTROL_OPS:
+                    parts = control_reply(stats, op, binary, server_extra)
+                elif binary:
+                    parts = protocol.get_frame(words, p, k)
                 else:
- 
-                    current_client_idx = (current_client_idx + 1) % len(client_list)
-                    attempts += 1
-            
-
-            if attempts == len(client_list):
+                    parts = words.response(p, k)
+                stats.served(send_parts(sock, parts))
+                latency.record(client_id, arrived, dispatched, time.monotonic_ns())
                 continue
-        
-        try:
 
             parts = data.split(',')
             if len(parts) != 2:
-                conn.send("Invalid request format. Use: p,k\\n".encode())
-                conn.close()
+                sock.sendall("Invalid request format. Use: p,k\\n".encode())
                 continue
                 
             p = int(parts[0])
             k = int(parts[1])
             
 
-            if p >= len(words):
-                conn.send("EOF\n".encode())
-                conn.close()
-                continue
-                
-
-            end_idx = min(p + k, len(words))
-            response_words = words[p:end_idx]
-            
-
-            if end_idx == len(words):
-                response_words.append("EOF")
-                
-
-            response = ','.join(response_words) + '\n'
-            conn.send(response.encode())
+            stats.served(send_parts(sock, words.response(p, k)))
+            latency.record(client_id, arrived, dispatched, time.monotonic_ns())
             
         except ValueError:
-            conn.send("Invalid parameters. Use integers: p,k\\n".encode())
+            try:
+                sock.sendall("Invalid parameters. Use integers: p,k\\n".encode())
+            except OSError:
+                pass
+        except OSError:
+            # Peer is gone; the reader sees EOF and hangs up.
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
         except Exception as e:
             print(f"Error processing request: {e}")
         finally:
-            conn.close()
+            if done:
+                if isinstance(data, Stream) and data.file is not None:
+                    data.file.close()
+                finish(conn)
 
 def start_server():
+    dump_at_exit(latency, LATENCY_FILE)
+    if trace:
+        dump_at_exit(trace, TRACE_FILE)
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind((HOST, PORT))
-        s.listen()
+        s.listen(1024)
         print(f"Server listening on {HOST}:{PORT}")
         
 
@@ -133,10 +335,7 @@ def start_server():
         worker.start()
         
 
-        while True:
-            conn, addr = s.accept()
-            client_thread = threading.Thread(target=handle_client, args=(conn, addr))
-            client_thread.start()
+        reader_loop(s)
 
 if __name__ == "__main__":
     start_server()
\ No newline at end of file
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Single-process asyncio load generator for the part3/part4 servers.
+
+Simulates many logical clients from one process instead of one
+`python3 client.py` per Mininet host. Each logical client downloads the
+whole file with p,k requests and records when it saw EOF.
+
+  closed loop (default): every client keeps a fixed number of requests in
+      flight, sending the next as each reply arrives (greedy clients keep c).
+  open loop (--rate R):  requests arrive as Poisson processes whose rates
+      add up to R requests/s, split across clients by weight (greedy clients
+      weigh c, normal ones 1), whether or not earlier replies came back.
+
+Greedy clients either pipeline c requests on one connection (--greedy-style
+pipeline, what part3/client.py does) or hold c connections with one request
+each (--greedy-style pool, what part4/client.py does). Completion times are
+written to logs/ in the format the matching runner's parse_logs reads:
+"--log-format part3" writes ELAPSED_MS/FINISH_EPOCH lines to rogue.log and
+normal_<i>.log, "--log-format part4" writes the completion time in seconds.
+
+Run from a part directory so config.json supplies server_ip, port and k:
+
+    python3 ../tools/loadgen.py --clients 1000 --greedy 1 --c 20
+"""
+import argparse
+import asyncio
+import collections
+import ipaddress
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import config, protocol
+
+READ_LIMIT = 1 << 24    # large-k text replies are one long line
+
+
+class LogicalClient:
+    def __init__(self, index, name, greedy, window):
+        self.index = index
+        self.name = name
+        self.greedy = greedy
+        self.window = window
+        self.next_p = 0
+        self.eof = False
+        self.finish = None          # epoch seconds when EOF arrived
+        self.requests = 0
+
+
+class Lane:
+    """One connection of a logical client and the offsets it is waiting on."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = collections.deque()
+        self.wakeup = asyncio.Event()
+
+
+async def read_reply(reader, binary):
+    """Consume one reply; True if it carried the EOF marker."""
+    if binary:
+        flags, length = protocol.RESP.unpack(await reader.readexactly(protocol.RESP.size))
+        await reader.readexactly(length)
+        return bool(flags & protocol.FLAG_EOF)
+    line = (await reader.readline()).strip()
+    return not line or line == b"EOF" or line.endswith(b",EOF")
+
+
+class LoadGen:
+    def __init__(self, args, cfg):
+        self.args = args
+        self.host = args.host or cfg["server_ip"]
+        self.port = int(args.port or cfg["port"])
+        self.k = int(args.k or cfg.get("k", 5))
+        self.binary = args.protocol == "binary"
+        self.bind_base = ipaddress.ip_address(args.bind_base) if args.bind_base else None
+
+        self.clients = []
+        for i in range(args.clients):
+            greedy = i < args.greedy
+            if greedy:
+                name = "rogue" if i == 0 else f"rogue_{i + 1}"
+            else:
+                name = f"normal_{i + 1}"
+            self.clients.append(LogicalClient(i, name, greedy, args.c if greedy else 1))
+
+    def request(self, client, lane):
+        p = client.next_p
+        client.next_p += self.k
+        client.requests += 1
+        if self.binary:
+            lane.writer.write(protocol.encode_request(p, self.k))
+        else:
+            lane.writer.write(f"{p},{self.k}\n".encode())
+        lane.pending.append(p)
+        lane.wakeup.set()
+
+    async def connect(self, client):
+        local = (str(self.bind_base + client.index), 0) if self.bind_base else None
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, local_addr=local, limit=READ_LIMIT)
+        if self.binary:
+            writer.write(protocol.MAGIC)
+        return Lane(reader, writer)
+
+    async def lanes_for(self, client):
+        if client.greedy and self.args.greedy_style == "pool":
+            return [await self.connect(client) for _ in range(client.window)]
+        return [await self.connect(client)]
+
+    def mark_eof(self, client, lanes):
+        if not client.eof:
+            client.eof = True
+            client.finish = time.time()
+            for lane in lanes:
+                lane.wakeup.set()
+
+    async def drain(self, client, lane, lanes, refill):
+        """Read replies on one lane until the client is done and nothing is owed."""
+        while True:
+            if not lane.pending:
+                if client.eof:
+                    return
+                await lane.wakeup.wait()
+                lane.wakeup.clear()
+                continue
+            if await read_reply(lane.reader, self.binary):
+                self.mark_eof(client, lanes)
+            lane.pending.popleft()
+            if refill and not client.eof:
+                self.request(client, lane)
+
+    async def run_client(self, client, start_at, rate):
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        lanes = await self.lanes_for(client)
+        try:
+            if rate is None:
+                # Closed loop: fill each lane, then one new request per reply.
+                per_lane = client.window if len(lanes) == 1 else 1
+                for lane in lanes:
+                    for _ in range(per_lane):
+                        self.request(client, lane)
+                await asyncio.gather(*(self.drain(client, lane, lanes, True) for lane in lanes))
+            else:
+                readers = [asyncio.ensure_future(self.drain(client, lane, lanes, False)) for lane in lanes]
+                rng = random.Random(self.args.seed * 100003 + client.index)
+                i = 0
+                while not client.eof:
+                    self.request(client, lanes[i % len(lanes)])
+                    i += 1
+                    await asyncio.sleep(rng.expovariate(rate))
+                await asyncio.gather(*readers)
+        finally:
+            for lane in lanes:
+                lane.writer.close()
+
+    async def run(self):
+        weights = [c.window for c in self.clients]
+        total = sum(weights)
+        start = time.time()
+        tasks = []
+        for client, w in zip(self.clients, weights):
+            rate = self.args.rate * w / total if self.args.rate else None
+            tasks.append(self.run_client(client, start, rate))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        failed = [(c.name, res) for c, res in zip(self.clients, results) if isinstance(res, Exception)]
+        if failed:
+            name, err = failed[0]
+            print(f"[warn] {len(failed)} clients failed, first {name}: {err!r}")
+        return start
+
+
+def write_logs(clients, start, fmt, logdir):
+    os.makedirs(logdir, exist_ok=True)
+    for c in clients:
+        if c.finish is None:
+            continue
+        with open(os.path.join(logdir, f"{c.name}.log"), "w") as f:
+            if fmt == "part3":
+                f.write(f"ELAPSED_MS:{int((c.finish - start) * 1000)}\n")
+                f.write(f"FINISH_EPOCH:{c.finish:.6f}\n")
+            else:
+                f.write(f"{c.finish - start}")
+
+
+def summarize(clients, start):
+    times = sorted(c.finish - start for c in clients if c.finish is not None)
+    if not times:
+        print("No client finished")
+        return
+    u = [1.0 / max(t, 1e-6) for t in times]
+    jfi = sum(u) ** 2 / (len(u) * sum(x * x for x in u))
+    pct = lambda q: times[min(len(times) - 1, int(q * len(times)))]
+    print(f"clients={len(times)}/{len(clients)} requests={sum(c.requests for c in clients)} "
+          f"mean_s={sum(times) / len(times):.3f} p50_s={pct(0.5):.3f} p99_s={pct(0.99):.3f} jfi={jfi:.4f}")
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--host", help="Server address (default: config server_ip)")
+    ap.add_argument("--port", type=int, help="Server port (default: config port)")
+    ap.add_argument("--k", type=int, help="Words per request (default: config k)")
+    ap.add_argument("--clients", type=int, default=10, help="Logical clients")
+    ap.add_argument("--greedy", type=int, default=1, help="How many of them are greedy")
+    ap.add_argument("--c", type=int, default=1, help="Requests a greedy client keeps outstanding")
+    ap.add_argument("--greedy-style", choices=["pipeline", "pool"], default=None,
+                    help="pipeline: c requests on one connection; pool: c connections "
+                         "(default: pipeline for part3 logs, pool for part4)")
+    ap.add_argument("--rate", type=float, default=None,
+                    help="Open loop: aggregate Poisson request rate (req/s); default closed loop")
+    ap.add_argument("--protocol", choices=["text", "binary"], default=None)
+    ap.add_argument("--bind-base", default=None,
+                    help="Give client i source address bind_base + i (must be local addresses)")
+    ap.add_argument("--log-format", choices=["part3", "part4"], default="part3")
+    ap.add_argument("--log-dir", default="logs")
+    ap.add_argument("--seed", type=int, default=1)
+    config.add_arguments(ap)
+    args = ap.parse_args()
+
+    cfg = config.load(args.config, args.set)
+    if args.protocol is None:
+        args.protocol = cfg.get("protocol", "text")
+    if args.greedy_style is None:
+        args.greedy_style = "pipeline" if args.log_format == "part3" else "pool"
+
+    raise_fd_limit()
+    gen = LoadGen(args, cfg)
+    start = asyncio.run(gen.run())
+    write_logs(gen.clients, start, args.log_format, args.log_dir)
+    summarize(gen.clients, start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Run the part2/part3/part4 experiment sweeps on loopback, without Mininet.
+
+The servers and clients are started as ordinary local processes in a
+temporary copy of the part directory whose config.json points at 127.0.0.1
+and a free port. Client i connects from its own address 127.0.1.(i+1), so
+part4's per-IP scheduling sees separate clients exactly as on the Mininet
+hosts. One server serves the whole sweep and is RESET before every run,
+like the runners' --sweep mode; each run's server latency histograms are
+kept under <out>/latency_p3 or <out>/latency_p4, and with --set
+trace_file=... its request trace under <out>/trace_p3 or <out>/trace_p4.
+Log files, JFI calculation and result CSVs come from the part's own runner (parse_logs, calculate_jfi,
+RESULTS_CSV), so the existing plot scripts read the output unchanged; every
+run is also recorded to <out>/results.npz through the runner's record()
+(see common/results.py), and the CSV and npz are written once, when the
+sweep ends or is interrupted. No root, Open vSwitch or Mininet needed.
+
+Run from the part directory, like the runners, so results land next to them:
+
+    cd part3 && python3 ../tools/loopback.py part3 --c 1,4,8 --set proc_ms=0
+    cd part4 && python3 ../tools/loopback.py part4 --runs 1
+    cd part2 && python3 ../tools/loopback.py part2 --clients 1,8,32
+
+Timing differs from Mininet (no 1 Mbps links), so compare trends, not values.
+"""
+import argparse
+import importlib.util
+import ipaddress
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from common import config
+from common.control import reset
+from common.results import ResultStore
+
+SERVER_IP = "127.0.0.1"
+CLIENT_BASE_IP = "127.0.1.1"    # client i connects from CLIENT_BASE_IP + i
+READY_TIMEOUT = 10
+CLIENT_TIMEOUT = 600
+
+
+def client_ip(i):
+    return str(ipaddress.ip_address(CLIENT_BASE_IP) + i)
+
+
+def load_module(part, filename):
+    """Import a part's runner by path (they are all called runner.py)."""
+    part_dir = str(ROOT / part)
+    if part_dir not in sys.path:
+        sys.path.insert(0, part_dir)
+    spec = importlib.util.spec_from_file_location(f"{part}_{Path(filename).stem}", ROOT / part / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((SERVER_IP, 0))
+        return s.getsockname()[1]
+
+
+class Workspace:
+    """A throwaway copy of one part directory wired to loopback."""
+
+    def __init__(self, part, overrides):
+        self.part_dir = ROOT / part
+        # WC_* variables and --set overrides are baked into the copy
+        cfg = config.load(self.part_dir / config.DEFAULT_FILE, overrides)
+        self.dir = Path(tempfile.mkdtemp(prefix=f"loopback_{part}_"))
+        cfg["server_ip"] = SERVER_IP
+        port_key = "server_port" if "server_port" in cfg else "port"
+        cfg[port_key] = self.port = free_port()
+        with open(self.dir / "config.json", "w") as f:
+            json.dump(cfg, f, indent=2)
+        filename = cfg.get("filename", "words.txt")
+        shutil.copy(self.part_dir / filename, self.dir / filename)
+        (self.dir / "logs").mkdir()
+        self.config = cfg
+        self.server = None
+
+    def start_server(self):
+        self.server = subprocess.Popen([sys.executable, str(self.part_dir / "server.py")], cwd=self.dir,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.reset()
+
+    def reset(self):
+        """Wait until the server answers RESET; call before every run."""
+        try:
+            reset(SERVER_IP, self.port, READY_TIMEOUT)
+        except TimeoutError:
+            raise RuntimeError(f"server in {self.dir} did not answer (exit code {self.server.poll()})")
+
+    def save_latency(self, dest):
+        """RESET so the server writes the run's latency histograms; keep them
+        and return the snapshot (None if nothing was recorded)."""
+        self.reset()
+        src = self.dir / self.config.get("latency_file", "logs/latency.json")
+        if not src.exists():
+            return None
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(src), dest)
+        with open(dest) as f:
+            return json.load(f)
+
+    def save_trace(self, dest):
+        """Keep the request trace written by the same RESET, if tracing is on."""
+        if "trace_file" not in self.config:
+            return
+        src = self.dir / self.config["trace_file"]
+        if src.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(src), dest)
+
+    def stop_server(self):
+        if self.server is not None:
+            stop(self.server)
+            self.server = None
+
+    def client(self, i, args, stdout=subprocess.DEVNULL):
+        cmd = [sys.executable, str(self.part_dir / "client.py"), *map(str, args), "--bind-ip", client_ip(i)]
+        return subprocess.Popen(cmd, cwd=self.dir, stdout=stdout, stderr=subprocess.STDOUT)
+
+    def loadgen(self, n, c, log_format):
+        cmd = [sys.executable, str(ROOT / "tools" / "loadgen.py"), "--clients", str(n), "--greedy", "1",
+               "--c", str(c), "--log-format", log_format, "--bind-base", CLIENT_BASE_IP]
+        return subprocess.Popen(cmd, cwd=self.dir, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+    def remove(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def wait_all(procs):
+    for proc in procs:
+        try:
+            proc.wait(timeout=CLIENT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def sweep_part2(ws, args, out):
+    """Average client elapsed time vs number of concurrent clients."""
+    exp = load_module("part2", "run_experiments_part2.py")
+    store = ResultStore(out / "results.npz")
+    rows = []
+    try:
+        for n in args.clients or exp.NUM_CLIENTS_LIST:
+            for r in range(1, (args.runs or exp.RUNS_PER_SETTING) + 1):
+                ws.reset()
+                procs = [ws.client(i, [], stdout=subprocess.PIPE) for i in range(n)]
+                elapsed, names = [], []
+                for i, proc in enumerate(procs):
+                    m = re.search(r"ELAPSED_MS:(\d+)", exp.safe_get_output(proc))
+                    if m:
+                        elapsed.append(int(m.group(1)))
+                        names.append(f"h{i + 1}")    # as on the Mininet hosts
+                if not elapsed:
+                    print(f"[warn] No results for num_clients={n} run={r}")
+                    continue
+                avg_ms = exp.record(store, rows, n, r, names, elapsed)
+                print(f"num_clients={n} run={r} avg_elapsed_ms={avg_ms:.2f}")
+    finally:
+        exp.flush(store, rows, out / exp.RESULTS_CSV.name)
+
+
+def run_round(ws, runner, c, log_format, loadgen):
+    """One rogue (c requests outstanding) plus num_clients-1 normal clients."""
+    runner.cleanup_logs()
+    ws.reset()
+    exp_start = time.time()
+    logs = []
+    try:
+        if loadgen:
+            procs = [ws.loadgen(runner.num_clients, c, log_format)]
+        else:
+            procs = []
+            for i in range(runner.num_clients):
+                name = "rogue" if i == 0 else f"normal_{i + 1}"
+                batch = c if i == 0 else 1
+                # part3 clients print their log; part4 clients write it themselves.
+                stdout = subprocess.DEVNULL
+                if log_format == "part3":
+                    stdout = open(ws.dir / "logs" / f"{name}.log", "w")
+                    logs.append(stdout)
+                procs.append(ws.client(i, ["--batch-size", batch, "--client-id", name], stdout))
+        wait_all(procs)
+    finally:
+        for f in logs:
+            f.close()
+    return exp_start
+
+
+def sweep_part3(ws, args, out):
+    """JFI vs c under FCFS, written like part3/runner.py does."""
+    mod = load_module("part3", "runner.py")
+    runner = mod.Runner(config_file="config.json", runs_per_c=args.runs or 1)
+    runner.store = ResultStore(out / "results.npz")
+    runner.results_csv = out / mod.RESULTS_CSV.name
+    try:
+        for c in args.c or range(1, runner.c_max + 1):
+            for r in range(1, runner.runs_per_c + 1):
+                exp_start = run_round(ws, runner, c, "part3", args.loadgen)
+                latency = ws.save_latency(out / "latency_p3" / f"c{c}_r{r}.json")
+                ws.save_trace(out / "trace_p3" / f"c{c}_r{r}.bin")
+                results = runner.parse_logs(exp_start)
+                jfi = runner.calculate_jfi(results)
+                runner.record(c, r, results, jfi, latency)
+                print(f"c={c}, run={r}, JFI={jfi:.3f}")
+    finally:
+        runner.flush()
+
+
+def sweep_part4(ws, args, out):
+    """JFI vs c under round robin, written like part4/runner.py does."""
+    mod = load_module("part4", "runner.py")
+    runner = mod.Runner(config_file="config.json")
+    runner.store = ResultStore(out / "results.npz")
+    runner.results_csv = out / "results.csv"
+    reps = args.runs or runner.num_repetitions
+    if runner.results_csv.exists():
+        runner.results_csv.unlink()
+
+    with runner.saving():
+        for c in args.c or mod.C_VALUES:
+            jfi_sum = 0
+            for rep in range(reps):
+                run_round(ws, runner, c, "part4", args.loadgen)
+                latency = ws.save_latency(out / "latency_p4" / f"c{c}_r{rep + 1}.json")
+                ws.save_trace(out / "trace_p4" / f"c{c}_r{rep + 1}.bin")
+                results = runner.parse_logs()
+                results['latency'] = latency
+                jfi = runner.calculate_jfi(results['rogue'] + results['normal'])
+                jfi_sum += jfi
+                runner.record(c, rep + 1, results, jfi)
+                print(f"JFI for c={c}, rep{rep + 1}: {jfi:.4f}")
+            runner.csv_rows.append(f"{c},{jfi_sum / reps:.4f}\n")
+            print(f"Average JFI for c={c}: {jfi_sum / reps:.4f}")
+
+
+SWEEPS = {"part2": sweep_part2, "part3": sweep_part3, "part4": sweep_part4}
+
+
+def int_list(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("part", choices=sorted(SWEEPS))
+    ap.add_argument("--clients", type=int_list, help="part2: comma-separated client counts")
+    ap.add_argument("--c", type=int_list, help="part3/part4: comma-separated c values")
+    ap.add_argument("--runs", type=int, help="Runs per point (default: the runner's)")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                    help="Override a config value in the workspace copy")
+    ap.add_argument("--loadgen", action="store_true",
+                    help="part3/part4: drive all clients from tools/loadgen.py")
+    ap.add_argument("--out", default=".", help="Directory for the result CSV")
+    ap.add_argument("--keep", action="store_true", help="Keep the temporary workspace")
+    args = ap.parse_args()
+
+    out = Path(args.out).resolve()
+    out.mkdir(parents=True, exist_ok=True)
+    try:
+        ws = Workspace(args.part, args.set)
+    except ValueError as e:
+        ap.error(str(e))
+    # The workspace config already has them; in the environment they would
+    # override its loopback address and port in every server and client.
+    for name in [n for n in os.environ if n.startswith(config.ENV_PREFIX)]:
+        del os.environ[name]
+    cwd = os.getcwd()
+    # The runners' log helpers use paths relative to the experiment directory.
+    os.chdir(ws.dir)
+    try:
+        ws.start_server()
+        SWEEPS[args.part](ws, args, out)
+    finally:
+        ws.stop_server()
+        os.chdir(cwd)
+        if args.keep:
+            print(f"Workspace kept in {ws.dir}")
+        else:
+            ws.remove()
+
+
+if __name__ == "__main__":
+    main()
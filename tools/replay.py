@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Replay a request trace (common/trace.py) against a part3 or part4 server.
+
+Each traced connection is opened again and re-sends its requests at their
+recorded arrival times divided by --speed. This is open loop: a request goes
+out on time whether or not earlier replies have come back, so FCFS and
+round robin can be compared on exactly the same workload:
+
+    cd part3 && python3 server.py --set trace_file=logs/trace.bin    # record
+    cd part4 && python3 ../tools/replay.py ../part3/logs/trace.bin --speed 10
+
+--speed 1 keeps the recorded timing, 10 plays it ten times faster and 0
+sends every connection's requests back to back. The part4 server schedules
+by source IP, so replayed clients need addresses of their own:
+--bind-original connects from the recorded addresses (when they are local,
+e.g. for traces taken under tools/loopback.py), and --bind-base gives the
+i-th client in the trace bind_base + i.
+
+Per client it prints the requests, reply latency from send to complete
+reply, and completion time (the last reply), then Jain's fairness index
+over the completion times. --out writes the same as JSON.
+"""
+import argparse
+import asyncio
+import collections
+import ipaddress
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import config, protocol, trace
+from common.histogram import LatencyHistogram
+
+READ_LIMIT = 1 << 24    # large-k text replies are one long line
+
+
+def encode(rec, binary):
+    if binary:
+        return protocol.encode_request(rec.p, rec.k, rec.op)
+    if rec.op == protocol.OP_STREAM:
+        return f"STREAM {rec.p}\n".encode()
+    if rec.op == protocol.OP_COUNT:
+        return f"COUNT {rec.p},{rec.k}\n".encode()
+    return f"{rec.p},{rec.k}\n".encode()
+
+
+async def read_reply(reader, binary, op):
+    """Consume one whole reply; a binary STREAM reply is every frame up to EOF."""
+    if not binary:
+        if not await reader.readline():
+            raise ConnectionError("server closed the connection")
+        return
+    while True:
+        flags, length = protocol.RESP.unpack(await reader.readexactly(protocol.RESP.size))
+        await reader.readexactly(length)
+        if op != protocol.OP_STREAM or flags & protocol.FLAG_EOF:
+            return
+
+
+class ClientStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()   # microseconds
+        self.requests = 0
+        self.last = None                    # monotonic_ns() of the last reply
+
+
+class Replay:
+    def __init__(self, args, cfg, records):
+        self.host = args.host or cfg["server_ip"]
+        self.port = int(args.port or cfg.get("port", cfg.get("server_port", 0)))
+        self.speed = args.speed
+        self.protocol = args.protocol
+        self.conns = collections.defaultdict(list)      # conn -> its records, in order
+        self.clients = {}                               # client IP -> ClientStats
+        for rec in records:
+            self.conns[rec.conn].append(rec)
+            if rec.client not in self.clients:
+                self.clients[rec.client] = ClientStats()
+        base = ipaddress.ip_address(args.bind_base) if args.bind_base else None
+        self.local = {}
+        for i, client in enumerate(self.clients):
+            if args.bind_original:
+                self.local[client] = (client, 0)
+            elif base:
+                self.local[client] = (str(base + i), 0)
+            else:
+                self.local[client] = None
+
+    async def send_all(self, recs, writer, binary, start, sent):
+        for rec in recs:
+            if self.speed:
+                delay = start + rec.t_us / 1e6 / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            writer.write(encode(rec, binary))
+            sent.put_nowait((rec.op, time.monotonic_ns()))
+            await writer.drain()
+
+    async def receive_all(self, n, reader, binary, stats, sent):
+        for _ in range(n):
+            op, t0 = await sent.get()
+            await read_reply(reader, binary, op)
+            stats.last = time.monotonic_ns()
+            stats.latency.record((stats.last - t0) // 1000)
+            stats.requests += 1
+
+    async def run_conn(self, recs, start):
+        first = recs[0]
+        binary = first.binary if self.protocol is None else self.protocol == "binary"
+        if self.speed:
+            await asyncio.sleep(max(0.0, start + first.t_us / 1e6 / self.speed - time.monotonic()))
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, local_addr=self.local[first.client], limit=READ_LIMIT)
+        try:
+            if binary:
+                writer.write(protocol.MAGIC)
+            sent = asyncio.Queue()
+            await asyncio.gather(self.send_all(recs, writer, binary, start, sent),
+                                 self.receive_all(len(recs), reader, binary, self.clients[first.client], sent))
+        finally:
+            writer.close()
+
+    async def run(self):
+        """Replay everything; returns the start as monotonic_ns()."""
+        start_ns = time.monotonic_ns()
+        start = start_ns / 1e9
+        conns = list(self.conns.values())
+        results = await asyncio.gather(*(self.run_conn(recs, start) for recs in conns),
+                                       return_exceptions=True)
+        failed = [(recs[0], res) for recs, res in zip(conns, results) if isinstance(res, Exception)]
+        if failed:
+            rec, err = failed[0]
+            print(f"[warn] {len(failed)} connections failed, first from {rec.client}: {err!r}")
+        return start_ns
+
+
+def summary(replay, start_ns, args, n_records):
+    clients = {}
+    for client, stats in replay.clients.items():
+        snap = stats.latency.snapshot()
+        snap["requests"] = stats.requests
+        snap["completion_s"] = (stats.last - start_ns) / 1e9 if stats.last else None
+        clients[client] = snap
+    times = [c["completion_s"] for c in clients.values() if c["completion_s"] is not None]
+    u = [1.0 / max(t, 1e-6) for t in times]
+    jfi = sum(u) ** 2 / (len(u) * sum(x * x for x in u)) if u else 0.0
+    return {"trace": args.trace, "speed": args.speed, "server": f"{replay.host}:{replay.port}",
+            "records": n_records, "jfi": jfi, "clients": clients}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("trace", help="Trace file written by a server with trace_file set")
+    ap.add_argument("--speed", type=float, default=1.0,
+                    help="Time scale: 1 as recorded, 10 ten times faster, 0 as fast as possible")
+    ap.add_argument("--host", help="Server address (default: config server_ip)")
+    ap.add_argument("--port", type=int, help="Server port (default: config port)")
+    ap.add_argument("--protocol", choices=["text", "binary"], default=None,
+                    help="Wire format (default: as recorded, per connection)")
+    bind = ap.add_mutually_exclusive_group()
+    bind.add_argument("--bind-original", action="store_true",
+                      help="Connect from each client's recorded address")
+    bind.add_argument("--bind-base", default=None,
+                      help="Give the i-th client source address bind_base + i")
+    ap.add_argument("--out", default=None, help="Write the summary as JSON to this file")
+    config.add_arguments(ap)
+    args = ap.parse_args()
+    if args.speed < 0:
+        ap.error("--speed must be >= 0")
+
+    cfg = config.load(args.config, args.set)
+    _, records = trace.load(args.trace)
+    if not records:
+        print("Trace is empty")
+        return
+    replay = Replay(args, cfg, records)
+    start_ns = asyncio.run(replay.run())
+    result = summary(replay, start_ns, args, len(records))
+
+    for client, c in result["clients"].items():
+        done = f"{c['completion_s']:.3f}" if c["completion_s"] is not None else "-"
+        print(f"{client:<15} requests={c['requests']:<6} p50_ms={c['p50_us'] / 1000:.2f} "
+              f"p99_ms={c['p99_us'] / 1000:.2f} completion_s={done}")
+    print(f"clients={len(result['clients'])} connections={len(replay.conns)} records={len(records)} "
+          f"speed={args.speed:g} jfi={result['jfi']:.4f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Talk to the server in ./config.json: RESET (default), PING or STATS.
+
+The runners call this on a client host (the server lives in another
+network namespace under Mininet), once after starting the server and again
+before every later run of a sweep:
+
+    python3 ../tools/serverctl.py [reset|ping] [--timeout 30]
+    python3 ../tools/serverctl.py stats [--watch 0.5]
+
+reset and ping print READY_MS:<ms waited> and exit non-zero if the server
+does not answer in time. stats prints the counters as one JSON line; with
+--watch it keeps printing one line per interval (with a "t" field, seconds
+since the first) until interrupted, to watch queues build up during a run.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import config, control
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", nargs="?", choices=["reset", "ping", "stats"], default="reset")
+    ap.add_argument("--timeout", type=float, default=control.READY_TIMEOUT)
+    ap.add_argument("--watch", type=float, default=None, metavar="SECONDS",
+                    help="stats: repeat every SECONDS until interrupted")
+    ap.add_argument("--bind-ip", default=None, help="Local address to connect from")
+    config.add_arguments(ap)
+    args = ap.parse_args()
+
+    cfg = config.load(args.config, args.set)
+    host = cfg["server_ip"]
+    port = cfg.get("port", cfg.get("server_port", 0))
+    source = (args.bind_ip, 0) if args.bind_ip else None
+
+    try:
+        if args.command != "stats":
+            waited = getattr(control, args.command)(host, port, args.timeout, source)
+            print(f"READY_MS:{waited * 1000:.0f}")
+            return
+        t0 = time.monotonic()
+        while True:
+            snap = control.stats(host, port, args.timeout, source)
+            if args.watch is None:
+                print(json.dumps(snap))
+                return
+            print(json.dumps({"t": round(time.monotonic() - t0, 3), **snap}), flush=True)
+            time.sleep(args.watch)
+    except (TimeoutError, ConnectionError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()